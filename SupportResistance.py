@@ -2,140 +2,124 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
-import yfinance as yf
 from datetime import datetime, timedelta
-
-# Title for the Streamlit app
-st.title("Stock Price Analysis with Buy/Sell Signals")
-
-# List of top 50 stocks
-top_stocks = [
-    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA',
-    'FB', 'BRK.B', 'NVDA', 'JPM', 'JNJ',
-    'V', 'PG', 'UNH', 'HD', 'DIS',
-    'MA', 'PYPL', 'VZ', 'NFLX', 'INTC',
-    'CMCSA', 'T', 'PEP', 'KO', 'CSCO',
-    'NKE', 'MRK', 'XOM', 'TMO', 'PFE',
-    'ABT', 'AVGO', 'COST', 'CRM', 'MDT',
-    'NVS', 'AMGN', 'LLY', 'HON', 'QCOM',
-    'LMT', 'TXN', 'IBM', 'AMD', 'ADBE',
-    'CVX', 'PM', 'TGT', 'SBUX', 'NOW'
-]
-
-# Dropdown for selecting stock ticker
-ticker = st.sidebar.selectbox("Select Stock:", top_stocks)
-
-# Dropdown for selecting time period
-time_period = st.sidebar.selectbox(
-    "Select Time Period:",
-    ["5 Years", "3 Years", "1 Year", "6 Months", "3 Months", "1 Month"]
-)
-
-# Calculate the start date based on the selected time period
-end_date = datetime.now()
-if time_period == "5 Years":
-    start_date = end_date - timedelta(days=5*365)
-elif time_period == "3 Years":
-    start_date = end_date - timedelta(days=3*365)
-elif time_period == "1 Year":
-    start_date = end_date - timedelta(days=365)
-elif time_period == "6 Months":
-    start_date = end_date - timedelta(days=6*30)
-elif time_period == "3 Months":
-    start_date = end_date - timedelta(days=3*30)
-else:  # "1 Month"
-    start_date = end_date - timedelta(days=30)
-
-# Fetch historical data for the selected stock within the specified date range
-data = yf.download(ticker, start=start_date, end=end_date)
-
-# Resetting index for proper date handling
-data.reset_index(inplace=True)
-
-# Input for threshold percentage from the user
-percentage = st.sidebar.slider("Threshold Percentage (%)", 1, 20, 2)
-
-# Define support and resistance levels
-most_support = data['Close'].min()  # Calculate actual most support
-most_resistance = data['Close'].max()  # Calculate actual most resistance
-
-# Function to add buy and sell signals
-def add_signals(data, most_support, most_resistance, percentage):
-    # Calculate thresholds
-    buy_threshold_high = most_support * (1 + percentage / 100)  # Buy threshold above most support
-    buy_threshold_low = most_support * (1 - percentage / 100)   # Buy threshold below most support
-    sell_threshold_high = most_resistance * (1 + percentage / 100)  # Sell threshold above most resistance
-    sell_threshold_low = most_resistance * (1 - percentage / 100)   # Sell threshold below most resistance
-
-    # Buy when the closing price is within the defined range around the support
-    buy_signal = (data['Close'] <= buy_threshold_high) & (data['Close'] >= buy_threshold_low)
-
-    # Sell when the closing price is within the defined range around the resistance
-    sell_signal = (data['Close'] >= sell_threshold_low) & (data['Close'] <= sell_threshold_high)
-
-    data['Buy'] = buy_signal
-    data['Sell'] = sell_signal
-    return data
-
-# Add buy/sell signals to the DataFrame
-data = add_signals(data, most_support, most_resistance, percentage)
-
-# Prepare for Plotly Chart
-fig = go.Figure(data=[go.Candlestick(x=data['Date'],
-                                       open=data['Open'],
-                                       high=data['High'],
-                                       low=data['Low'],
-                                       close=data['Close'])])
-
-# Add most support and resistance lines
-fig.add_shape(type="line",
-              x0=data['Date'].iloc[0], x1=data['Date'].iloc[-1],
-              y0=most_support, y1=most_support,
-              line=dict(color="blue", width=2, dash="dash"),
-              name="Most Support")
-
-fig.add_shape(type="line",
-              x0=data['Date'].iloc[0], x1=data['Date'].iloc[-1],
-              y0=most_resistance, y1=most_resistance,
-              line=dict(color="orange", width=2, dash="dash"),
-              name="Most Resistance")
-
-# Initialize variables for profit calculation
-total_investment = 0
-total_profit = 0
-shares_held = 0
-
-# Add buy and sell signals to the plot
-for i in range(len(data)):
-    if data['Buy'].iloc[i]:
-        shares_bought = 1000 / data['Close'].iloc[i]  # Calculate number of shares bought
-        total_investment += 1000  # Add $1000 to total investment
-        shares_held += shares_bought  # Update shares held
-        fig.add_trace(go.Scatter(
-            x=[data['Date'].iloc[i]],
-            y=[data['Close'].iloc[i]],
-            mode='markers',
-            marker=dict(color='blue', size=10, symbol='triangle-up'),
-            name='Buy Signal'
-        ))
-    if data['Sell'].iloc[i] and shares_held > 0:
-        total_profit += (data['Close'].iloc[i] * shares_held) - total_investment  # Calculate profit
-        shares_held = 0  # Reset shares held after selling
-        fig.add_trace(go.Scatter(
-            x=[data['Date'].iloc[i]],
-            y=[data['Close'].iloc[i]],
-            mode='markers',
-            marker=dict(color='red', size=10, symbol='triangle-down'),
-            name='Sell Signal'
-        ))
-
-# Show the figure in Streamlit
-st.plotly_chart(fig)
-
-# Calculate ROI
-roi = (total_profit / total_investment) * 100 if total_investment > 0 else 0
-
-# Display the results
-st.write("Data with Buy/Sell Signals:")
-st.dataframe(data[['Date', 'Close', 'Buy', 'Sell']])
-st.write(f"Return on Investment (ROI): {roi:.2f}%")
+from series import load_series
+from indicators import add_signals
+from backtest import run_backtest
+from levels import LevelIndex
+from charts import add_candles, add_level, add_markers
+from universe import top_stocks
+from result_cache import cached
+from instrumentation import start_run, stage, sidebar_report
+
+# Function to add the signals, build the chart and work out the ROI for one
+# threshold; cached so moving the slider back to a seen value costs nothing
+@cached
+def plot_signals(data, candles, candle_label, most_support, most_resistance, percentage):
+    # Add buy/sell signals to the DataFrame
+    data = add_signals(data.copy(), most_support, most_resistance, percentage)
+
+    # Prepare for Plotly Chart
+    fig = go.Figure()
+    add_candles(fig, candles, name='Price', label=candle_label)
+
+    # Add most support and resistance lines
+    add_level(fig, most_support, "Most Support", color="blue")
+    add_level(fig, most_resistance, "Most Resistance", color="orange")
+
+    # Backtest the buys and sells to get the ROI, drawdown and trades
+    signals = data.set_index('Date')
+    result = run_backtest(signals['Close'], signals['Buy'], signals['Sell'])
+    buys = result.trades[result.trades['Side'] == 'Buy']
+    sells = result.trades[result.trades['Side'] == 'Sell']
+
+    # Add buy and sell signals to the plot, one trace per signal type
+    add_markers(fig, buys['Date'], buys['Price'], 'Buy Signal', color='blue', symbol='triangle-up')
+    add_markers(fig, sells['Date'], sells['Price'], 'Sell Signal', color='red', symbol='triangle-down')
+
+    return data, fig, result
+
+# Function to find the strongest support and resistance among the pivot levels,
+# grouping pivots within the threshold percentage of each other
+@cached
+def pivot_levels(data, percentage):
+    index = LevelIndex.from_history(data, tolerance=percentage)
+    return index.strongest('support'), index.strongest('resistance'), index.top(5)
+
+def main():
+    # Title for the Streamlit app
+    st.title("Stock Price Analysis with Buy/Sell Signals")
+
+    # Dropdown for selecting stock ticker
+    ticker = st.sidebar.selectbox("Select Stock:", top_stocks)
+
+    # Dropdown for selecting time period
+    time_period = st.sidebar.selectbox(
+        "Select Time Period:",
+        ["5 Years", "3 Years", "1 Year", "6 Months", "3 Months", "1 Month"]
+    )
+
+    # Calculate the start date based on the selected time period
+    end_date = datetime.now()
+    if time_period == "5 Years":
+        start_date = end_date - timedelta(days=5*365)
+    elif time_period == "3 Years":
+        start_date = end_date - timedelta(days=3*365)
+    elif time_period == "1 Year":
+        start_date = end_date - timedelta(days=365)
+    elif time_period == "6 Months":
+        start_date = end_date - timedelta(days=6*30)
+    elif time_period == "3 Months":
+        start_date = end_date - timedelta(days=3*30)
+    else:  # "1 Month"
+        start_date = end_date - timedelta(days=30)
+
+    # Slice the selected date range out of the ticker's history, which is loaded
+    # once for the longest period and shared across reruns and sessions
+    with stage('load data'):
+        series = load_series(ticker)
+        candles, candle_label = series.candles(start_date)
+
+    # Resetting index for proper date handling
+    data = series.window(start_date).reset_index()
+
+    # Input for threshold percentage from the user
+    percentage = st.sidebar.slider("Threshold Percentage (%)", 1, 20, 2)
+
+    # How to pick the support and resistance levels
+    level_method = st.sidebar.selectbox("Level Method:", ["Min/Max Close", "Strongest Pivot Levels"])
+
+    # Define support and resistance levels
+    most_support = data['Close'].min()  # Calculate actual most support
+    most_resistance = data['Close'].max()  # Calculate actual most resistance
+    strong_levels = None
+    if level_method == "Strongest Pivot Levels":
+        # Levels touched most often, falling back to min/max without pivots
+        support, resistance, strong_levels = pivot_levels(data, percentage)
+        most_support = most_support if support is None else support
+        most_resistance = most_resistance if resistance is None else resistance
+
+    # Add buy/sell signals, plot them and backtest them
+    with stage('signals and figure'):
+        data, fig, result = plot_signals(data, candles, candle_label, most_support, most_resistance, percentage)
+
+    # Show the figure in Streamlit
+    with stage('render chart'):
+        st.plotly_chart(fig)
+
+    # Display the results
+    st.write("Data with Buy/Sell Signals:")
+    st.dataframe(data[['Date', 'Close', 'Buy', 'Sell']])
+    st.write(f"Return on Investment (ROI): {result.summary['ROI %'].iloc[0]:.2f}%")
+    st.write(f"Max Drawdown: {result.summary['Max Drawdown'].iloc[0]:,.2f} "
+             f"({result.summary['Max Drawdown %'].iloc[0]:.2f}% of invested)")
+    st.write("Trades:")
+    st.dataframe(result.trades.drop(columns='Ticker'), hide_index=True)
+    if strong_levels is not None:
+        st.write("Strongest pivot levels:")
+        st.dataframe(strong_levels, hide_index=True)
+
+if __name__ == "__main__":
+    start_run('SupportResistance')
+    main()
+    sidebar_report()
\ No newline at end of file
@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from indicators import williams_r, identify_support_resistance_levels, generate_trading_signals, add_signals
+from instrumentation import timed
+
+# Dollars put in on every buy signal, as in SupportResistance.py
+TRADE_SIZE = 1000
+
+
+@dataclass
+class BacktestResult:
+    summary: pd.DataFrame     # one row per ticker
+    portfolio: dict           # the same figures for all tickers together
+    pnl: pd.DataFrame         # mark-to-market profit per bar and ticker
+    trades: pd.DataFrame      # every buy and every sell that closed a position
+
+
+# Function to turn a Series into a one-column frame so everything below works
+# on (time x ticker) panels; signals take the column name of the prices `like`
+def as_panel(values, like=None):
+    if not isinstance(values, pd.Series):
+        return values
+    return values.to_frame(like.columns[0] if like is not None else values.name or 'Close')
+
+
+# Function to align a signal panel with the prices as a bars x tickers boolean array
+def signal_array(signal, close):
+    signal = as_panel(signal, close).reindex(index=close.index, columns=close.columns, fill_value=False)
+    return signal.fillna(False).to_numpy(dtype=bool)
+
+
+# Function to find, for every bar, the row of the last flagged bar at or before
+# it (-1 if none yet); flags is a bars x tickers boolean array
+def last_flagged(flags):
+    rows = np.where(flags, np.arange(len(flags))[:, None], -1)
+    return np.maximum.accumulate(rows, axis=0)
+
+
+# Function to look up values (bars x tickers) at the given rows, 0 where row is -1
+def value_at(values, rows):
+    if not len(values):
+        return np.zeros(rows.shape)
+    found = np.take_along_axis(values, np.maximum(rows, 0), axis=0)
+    return np.where(rows >= 0, found, 0.0)
+
+
+# Function to backtest the SupportResistance.py rule on a (time x ticker) panel:
+# buy TRADE_SIZE dollars of stock on every buy signal and sell everything on a
+# sell signal while holding. All tickers are processed at once with cumulative
+# sums over numpy arrays instead of a loop over bars.
+#
+# 'ROI %' keeps the app's definition (each sale is counted against everything
+# invested so far); 'PnL' and the drawdown use plain mark-to-market accounting.
+@timed
+def run_backtest(close, buy, sell):
+    close = as_panel(close)
+    buy = signal_array(buy, close)
+    sell = signal_array(sell, close)
+    prices = close.to_numpy(dtype='float64')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buys = np.cumsum(buy, axis=0)
+        shares = np.cumsum(np.where(buy, TRADE_SIZE / prices, 0.0), axis=0)
+
+        # A sell only trades if a buy happened since the previous sell bar (any
+        # earlier sell either emptied the position or found it empty)
+        previous_sell = np.vstack([np.full((1, prices.shape[1]), -1), last_flagged(sell)[:-1]])
+        closes_position = sell & (buys > value_at(buys, previous_sell))
+        sold_shares = np.where(closes_position, shares - value_at(shares, previous_sell), 0.0)
+        proceeds = np.where(closes_position, prices * sold_shares, 0.0)
+        invested = TRADE_SIZE * buys.astype('float64')
+
+        # The app's profit figure and ROI
+        app_profit = np.where(closes_position, proceeds - invested, 0.0).sum(axis=0)
+        total_invested = invested[-1] if len(invested) else np.zeros(prices.shape[1])
+        roi = np.where(total_invested > 0, app_profit / total_invested * 100, 0.0)
+
+        # Mark-to-market PnL and drawdown, valuing holdings at the last known close
+        held = shares - value_at(shares, last_flagged(closes_position))
+        marks = value_at(prices, last_flagged(~np.isnan(prices)))
+        pnl = np.cumsum(proceeds, axis=0) + held * marks - invested
+        drawdown = np.maximum.accumulate(pnl, axis=0) - pnl
+        drawdown_pct = np.where(invested > 0, drawdown / invested * 100, 0.0)
+
+        portfolio_pnl = pnl.sum(axis=1)
+        portfolio_invested = invested.sum(axis=1)
+        portfolio_drawdown = np.maximum.accumulate(portfolio_pnl) - portfolio_pnl
+        portfolio_drawdown_pct = np.where(portfolio_invested > 0, portfolio_drawdown / portfolio_invested * 100, 0.0)
+
+    summary = pd.DataFrame({
+        'Buys': buy.sum(axis=0),
+        'Sells': closes_position.sum(axis=0),
+        'Invested': total_invested,
+        'ROI %': roi,
+        'PnL': pnl[-1] if len(pnl) else np.zeros(prices.shape[1]),
+        'Max Drawdown': drawdown.max(axis=0, initial=0),
+        'Max Drawdown %': drawdown_pct.max(axis=0, initial=0),
+    }, index=pd.Index(close.columns, name='Ticker'))
+
+    portfolio_invested_total = float(total_invested.sum())
+    portfolio = {
+        'Buys': int(summary['Buys'].sum()),
+        'Sells': int(summary['Sells'].sum()),
+        'Invested': portfolio_invested_total,
+        'ROI %': float(app_profit.sum() / portfolio_invested_total * 100) if portfolio_invested_total > 0 else 0.0,
+        'PnL': float(summary['PnL'].sum()),
+        'Max Drawdown': float(portfolio_drawdown.max(initial=0)),
+        'Max Drawdown %': float(portfolio_drawdown_pct.max(initial=0)),
+    }
+
+    pnl = pd.DataFrame(pnl, index=close.index, columns=close.columns)
+    return BacktestResult(summary, portfolio, pnl, trade_list(close, buy, closes_position, sold_shares))
+
+
+# Function to list the trades of a backtest, buys and position-closing sells,
+# from the bars x tickers arrays of run_backtest
+def trade_list(close, buy, closes_position, sold_shares):
+    buy_rows, buy_columns = np.nonzero(buy)
+    sell_rows, sell_columns = np.nonzero(closes_position)
+    rows = np.concatenate([buy_rows, sell_rows])
+    columns = np.concatenate([buy_columns, sell_columns])
+    is_sell = np.arange(len(rows)) >= len(buy_rows)
+
+    # In bar order, then ticker, with a bar's buy ahead of its sell as in the app
+    order = np.lexsort((is_sell, columns, rows))
+    rows, columns, is_sell = rows[order], columns[order], is_sell[order]
+    price = close.to_numpy()[rows, columns]
+    shares = np.where(is_sell, sold_shares[rows, columns], TRADE_SIZE / price)
+    return pd.DataFrame({'Date': close.index[rows], 'Ticker': close.columns[columns],
+                         'Side': np.where(is_sell, 'Sell', 'Buy'), 'Price': price, 'Shares': shares,
+                         'Value': price * shares})
+
+
+# Function to get the add_signals threshold bands for every ticker of a close panel,
+# around each ticker's lowest and highest close as in SupportResistance.py
+def band_signals(close, percentage):
+    close = as_panel(close)
+    # add_signals only needs item access, so a dict holding the panel works as its data
+    bands = add_signals({'Close': close}, close.min(), close.max(), percentage)
+    return bands['Buy'], bands['Sell']
+
+
+# Function to get the Williams %R + support/resistance signals of williamR.py as
+# boolean panels; `data` is a (field, ticker) column panel
+def williams_r_signals(data, period=14):
+    wr = williams_r(data, period)
+    data = pd.concat([data, pd.concat({'Williams %R': wr}, axis=1)], axis=1)
+    levels = identify_support_resistance_levels(data, period=period)
+    buy_dates, sell_dates = generate_trading_signals(data, {ticker: level[1] for ticker, level in levels.items()},
+                                                     {ticker: level[3] for ticker, level in levels.items()})
+    buy = pd.DataFrame({ticker: data.index.isin(dates) for ticker, dates in buy_dates.items()}, index=data.index)
+    sell = pd.DataFrame({ticker: data.index.isin(dates) for ticker, dates in sell_dates.items()}, index=data.index)
+    return buy, sell
+
+
+# Function to get the EMA crossover signals of signals.py for every ticker at once
+def ema_signals(close, ema1_period, ema2_period):
+    close = as_panel(close)
+    above = (close.ewm(span=ema1_period, adjust=False).mean()
+             > close.ewm(span=ema2_period, adjust=False).mean()).astype(int)
+    position = above.diff()
+    return position == 1, position == -1
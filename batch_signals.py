@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+# Headless batch run of every signal the apps compute, e.g. from cron after the close:
+#
+#   python batch_signals.py --universe all --start 2024-01-01 --output eod.parquet
+#   python batch_signals.py AAPL MSFT --latest --output latest.csv
+#
+# Only the computation modules are imported (no Streamlit, no Plotly), and not
+# before the arguments have been parsed.
+
+UNIVERSES = ['candlestick', 'support-resistance', 'all']
+
+
+# Function to resolve the tickers to run from the arguments
+def resolve_tickers(args):
+    tickers = list(args.tickers)
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            tickers += [line.split('#')[0].strip() for line in f if line.split('#')[0].strip()]
+    if args.universe:
+        from universe import get_top_stocks, top_stocks
+        if args.universe in ('candlestick', 'all'):
+            tickers += list(get_top_stocks().values())
+        if args.universe in ('support-resistance', 'all'):
+            tickers += top_stocks
+    return list(dict.fromkeys(tickers))
+
+
+# Function to compute the signals of every ticker in a process pool; returns the
+# per-bar rows of all tickers and {ticker: error message}
+def run_batch(tickers, start, end, max_workers=None, **params):
+    import pandas as pd
+
+    from data_store import get_store
+    from scanner import history_ticker, process_pool
+
+    # Download concurrently up front; the workers then only read the store
+    get_store().refresh_many(tickers, start, end)
+
+    frames, errors = [], {}
+    max_workers = max_workers or min(len(tickers), os.cpu_count() or 1) or 1
+    with process_pool(max_workers) as pool:
+        futures = [pool.submit(history_ticker, ticker, start, end, **params) for ticker in tickers]
+        for future in futures:
+            ticker, history, error = future.result()
+            if error:
+                errors[ticker] = error
+            else:
+                frames.append(history.rename_axis('Date').reset_index().assign(Ticker=ticker))
+    if not frames:
+        return pd.DataFrame(), errors
+    results = pd.concat(frames, ignore_index=True)
+    return results[['Ticker'] + [column for column in results.columns if column != 'Ticker']], errors
+
+
+# Function to write results as Parquet or CSV, chosen by the file extension
+def write_results(results, path):
+    if path.endswith('.parquet'):
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute the trading signals of the apps for many tickers '
+                                                 'and write them to Parquet or CSV.')
+    parser.add_argument('tickers', nargs='*', help='ticker symbols')
+    parser.add_argument('--tickers-file', help='file with one ticker per line (# starts a comment)')
+    parser.add_argument('--universe', choices=UNIVERSES, help='add a built-in ticker list')
+    parser.add_argument('--start', type=date.fromisoformat, help='first date (default: one year before --end)')
+    parser.add_argument('--end', type=date.fromisoformat, help='last date, inclusive (default: today)')
+    parser.add_argument('--latest', action='store_true', help='only the latest bar of each ticker (screener rows)')
+    parser.add_argument('--output', default='signals.csv', help='.parquet or .csv file to write')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core)')
+    parser.add_argument('--percentage', type=float, default=2, help='support/resistance threshold (%%)')
+    parser.add_argument('--ema1', type=int, default=12, help='fast EMA length')
+    parser.add_argument('--ema2', type=int, default=26, help='slow EMA length')
+    parser.add_argument('--wr-period', type=int, default=14, help='Williams %%R period')
+    args = parser.parse_args(argv)
+
+    tickers = resolve_tickers(args)
+    if not tickers:
+        parser.error('no tickers given (pass symbols, --tickers-file or --universe)')
+    if args.output.endswith('.parquet'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                import fastparquet  # noqa: F401
+            except ImportError:
+                parser.error('writing Parquet needs pyarrow or fastparquet installed')
+
+    end = datetime.combine(args.end or date.today(), datetime.min.time()) + timedelta(days=1)
+    start = datetime.combine(args.start, datetime.min.time()) if args.start else end - timedelta(days=366)
+    params = dict(percentage=args.percentage, ema1_period=args.ema1, ema2_period=args.ema2,
+                  wr_period=args.wr_period)
+
+    if args.latest:
+        from scanner import scan_universe
+        results = scan_universe(tickers, start, end, max_workers=args.workers, **params)
+        errors = dict(zip(results['Ticker'], results['Error']))
+        errors = {ticker: error for ticker, error in errors.items() if error}
+        results = results[results['Error'] == ''].drop(columns='Error')
+    else:
+        results, errors = run_batch(tickers, start, end, max_workers=args.workers, **params)
+
+    for ticker, error in errors.items():
+        print(f'{ticker}: {error}', file=sys.stderr)
+    if len(results) == 0:
+        print('No ticker could be processed', file=sys.stderr)
+        return 1
+    write_results(results, args.output)
+    print(f'Wrote {len(results):,} rows for {len(tickers) - len(errors)} of {len(tickers)} tickers to {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from backtest import run_backtest, band_signals
+from ema_sweep import ema_matrix, sweep_crossovers
+from levels import LevelIndex, UniverseLevels
+from indicators import (williams_r, identify_support_resistance_levels, generate_trading_signals,
+                        calculate_ema, generate_signals, identify_candle_patterns, add_signals)
+from patterns import pattern_bitmask
+from rules import compile_rules
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+# Function to generate a reproducible random-walk OHLCV history. With
+# n_tickers > 1 the result is a (field, ticker) column panel like yf.download.
+def synthetic_ohlcv(n_bars, n_tickers=1, seed=0, start='2000-01-03', freq=None):
+    rng = np.random.default_rng(seed)
+    # Minute bars once daily dates would run past what pandas can represent
+    freq = freq or ('B' if n_bars <= 50_000 else 'min')
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='Date')
+
+    shape = (n_bars, n_tickers)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, shape), axis=0))
+    open_ = close * np.exp(rng.normal(0, 0.005, shape))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.005, shape)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.005, shape)))
+    volume = rng.integers(100_000, 10_000_000, shape).astype('float64')
+    fields = {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Adj Close': close, 'Volume': volume}
+
+    if n_tickers == 1:
+        return pd.DataFrame({field: values[:, 0] for field, values in fields.items()}, index=index)
+    tickers = [f'T{i:03d}' for i in range(n_tickers)]
+    return pd.concat({field: pd.DataFrame(values, index=index, columns=tickers)
+                      for field, values in fields.items()}, axis=1)
+
+
+# Each benchmark prepares its inputs outside the timed region and returns the
+# call to time. max_bars keeps the per-bar Python loops to sizes that finish.
+def _with_williams_r(data):
+    data = data.copy()
+    wr = williams_r(data)
+    if isinstance(data.columns, pd.MultiIndex):
+        return pd.concat([data, pd.concat({'Williams %R': wr}, axis=1)], axis=1)
+    data['Williams %R'] = wr
+    return data
+
+
+def _bench_trading_signals(data):
+    data = _with_williams_r(data)
+    levels = identify_support_resistance_levels(data, period=14)
+    if isinstance(levels, dict):
+        support = {ticker: level[1] for ticker, level in levels.items()}
+        resistance = {ticker: level[3] for ticker, level in levels.items()}
+    else:
+        support, resistance = levels[1], levels[3]
+    return lambda: generate_trading_signals(data, support, resistance)
+
+
+# Reference implementation of the ROI rule of SupportResistance.py, one bar at a
+# time, kept to measure run_backtest against: buy $1000 of stock on every buy
+# signal and sell everything on a sell signal. Returns the ROI (%) and the row
+# positions of the buys and of the sells that closed a position.
+def simulate_roi(data):
+    total_investment = 0
+    total_profit = 0
+    shares_held = 0
+    buy_rows = []
+    sell_rows = []
+
+    for i in range(len(data)):
+        if data['Buy'].iloc[i]:
+            shares_bought = 1000 / data['Close'].iloc[i]  # Calculate number of shares bought
+            total_investment += 1000  # Add $1000 to total investment
+            shares_held += shares_bought  # Update shares held
+            buy_rows.append(i)
+        if data['Sell'].iloc[i] and shares_held > 0:
+            total_profit += (data['Close'].iloc[i] * shares_held) - total_investment  # Calculate profit
+            shares_held = 0  # Reset shares held after selling
+            sell_rows.append(i)
+
+    # Calculate ROI
+    roi = (total_profit / total_investment) * 100 if total_investment > 0 else 0
+    return roi, buy_rows, sell_rows
+
+
+def _bench_roi(data):
+    data = add_signals(data.copy(), data['Close'].min(), data['Close'].max(), 10)
+    return lambda: simulate_roi(data)
+
+
+def _bench_backtest(data):
+    close = data['Close']
+    buy, sell = band_signals(close, 10)
+    return lambda: run_backtest(close, buy, sell)
+
+
+def _bench_levels(data):
+    if isinstance(data.columns, pd.MultiIndex):
+        return lambda: UniverseLevels.from_panel(data).near(1.0)
+    return lambda: LevelIndex.from_history(data).top(5)
+
+
+def _bench_rules(data):
+    plan = compile_rules({'Buy': 'ema(12) crosses above ema(26) and wr(14) < -50 or pattern(engulfing_bull)',
+                          'Sell': 'ema(12) crosses below ema(26) or wr(14) > -20 and high >= highest(14)'})
+    return lambda: plan.evaluate(data)
+
+
+def _bench_pattern_bitmask(data):
+    arrays = [data[field].to_numpy() for field in ('Open', 'High', 'Low', 'Close')]
+    return lambda: pattern_bitmask(*arrays)
+
+
+BENCHMARKS = {
+    'williams_r': dict(setup=lambda data: lambda: williams_r(data), panel=True),
+    'identify_support_resistance_levels': dict(
+        setup=lambda data: lambda: identify_support_resistance_levels(data, period=14), panel=True),
+    'generate_trading_signals': dict(setup=_bench_trading_signals, panel=True),
+    'calculate_ema': dict(setup=lambda data: lambda: calculate_ema(data, 26)),
+    'generate_signals': dict(setup=lambda data: lambda: generate_signals(data.copy(), 12, 26)),
+    'identify_candle_patterns': dict(setup=lambda data: lambda: identify_candle_patterns(data)),
+    'pattern_bitmask': dict(setup=_bench_pattern_bitmask, panel=True),
+    'add_signals': dict(setup=lambda data: lambda: add_signals(data.copy(), data['Close'].min(),
+                                                                data['Close'].max(), 2)),
+    'simulate_roi': dict(setup=_bench_roi, max_bars=100_000),
+    'run_backtest': dict(setup=_bench_backtest, panel=True),
+    'level_index': dict(setup=_bench_levels, panel=True),
+    'rules': dict(setup=_bench_rules, panel=True),
+    'ema_matrix': dict(setup=lambda data: lambda: ema_matrix(data['Close']), max_bars=1_000_000),
+    'sweep_crossovers': dict(setup=lambda data: lambda: sweep_crossovers(data['Close']), max_bars=10_000),
+}
+
+
+# Function to time a call (best of `repeat`) and record its peak traced memory
+def measure(call, repeat=3):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+# Function to fit time ~ size**exponent across the measured sizes
+def scaling_exponent(sizes, seconds):
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, seconds) if value > 0]
+    if len(points) < 2:
+        return math.nan
+    x, y = np.array(points).T
+    return float(np.polyfit(x, y, 1)[0])
+
+
+# Function to run the selected benchmarks over every size and ticker count
+def run_benchmarks(names, sizes, tickers=(1,), repeat=3, seed=0):
+    results = []
+    for n_tickers in tickers:
+        for n_bars in sizes:
+            data = synthetic_ohlcv(n_bars, n_tickers, seed=seed)
+            for name in names:
+                spec = BENCHMARKS[name]
+                if n_tickers > 1 and not spec.get('panel'):
+                    continue
+                if n_bars * n_tickers > spec.get('max_bars', math.inf):
+                    continue
+                seconds, peak = measure(spec['setup'](data), repeat)
+                results.append({'name': name, 'bars': n_bars, 'tickers': n_tickers,
+                                'seconds': seconds, 'peak_bytes': peak})
+                print(f'{name:<36} {n_bars:>10,} bars x {n_tickers:<4} {seconds * 1000:>11.3f} ms '
+                      f'{peak / 1024 ** 2:>10.1f} MB', flush=True)
+    return results
+
+
+# Function to print the time scaling exponent of every benchmark (1.0 is linear)
+def report_scaling(results):
+    print('\nScaling (time ~ bars^k):')
+    groups = {}
+    for result in results:
+        groups.setdefault((result['name'], result['tickers']), []).append(result)
+    for (name, n_tickers), group in groups.items():
+        exponent = scaling_exponent([r['bars'] for r in group], [r['seconds'] for r in group])
+        print(f'{name:<36} x {n_tickers:<4} k = {exponent:.2f}')
+
+
+def _result_key(result):
+    return f"{result['name']}|{result['bars']}|{result['tickers']}"
+
+
+# Function to compare results against a stored baseline; returns the regressions.
+# Differences under min_seconds / min_bytes are noise and never count as regressions.
+def compare_to_baseline(results, baseline, tolerance=0.25, min_seconds=0.002, min_bytes=1024 ** 2):
+    regressions = []
+    previous = {_result_key(result): result for result in baseline['results']}
+    print(f'\nAgainst baseline from {baseline.get("created", "?")} (tolerance {tolerance:.0%}):')
+    for result in results:
+        old = previous.get(_result_key(result))
+        if old is None:
+            continue
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] else math.inf
+        memory_ratio = result['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else 1.0
+        slower = ratio > 1 + tolerance and result['seconds'] - old['seconds'] > min_seconds
+        bigger = memory_ratio > 1 + tolerance and result['peak_bytes'] - old['peak_bytes'] > min_bytes
+        regressed = slower or bigger
+        if regressed:
+            regressions.append(result)
+        print(f"{result['name']:<36} {result['bars']:>10,} x {result['tickers']:<4} time x{ratio:.2f} "
+              f"memory x{memory_ratio:.2f}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the indicator and signal functions offline '
+                                                 'on seeded synthetic OHLCV data.')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run (default: all)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1_000, 10_000, 100_000],
+                        help='bar counts per ticker, e.g. 1000 100000 10000000')
+    parser.add_argument('--tickers', nargs='+', type=int, default=[1],
+                        help='ticker counts for the panel-capable functions, e.g. 1 50 500')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before failing')
+    args = parser.parse_args(argv)
+    # Without a baseline there is nothing to check against, which must not pass as success
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f'no baseline at {args.baseline}; run with --save-baseline to create one')
+
+    results = run_benchmarks(args.only or list(BENCHMARKS), args.sizes, args.tickers, args.repeat, args.seed)
+    report_scaling(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                       'numpy': np.__version__, 'pandas': pd.__version__, 'results': results}, f, indent=1)
+        print(f'\nBaseline saved to {args.baseline}')
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
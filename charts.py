@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import count
+
+# Plotly is imported inside the add_* helpers, so the data layer (series.py)
+# can use the resampling functions without loading it
+
+# Default number of points any one trace may send to the browser
+MAX_POINTS = 1500
+
+# Coarser and coarser candles tried until the series fits the point budget
+CANDLE_FREQUENCIES = [('Weekly', 'W'), ('Monthly', 'M'), ('Quarterly', 'Q'), ('Yearly', 'Y')]
+
+
+# Function to aggregate OHLC bars into coarser candles; each candle is placed at
+# the first bar of its period so signal markers still line up with it
+def resample_ohlc(df, period):
+    groups = df.index.to_period(period)
+    aggregations = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last'}
+    if 'Volume' in df.columns:
+        aggregations['Volume'] = 'sum'
+    candles = df[list(aggregations)].groupby(groups).agg(aggregations)
+    candles.index = pd.DatetimeIndex(df.index.to_series().groupby(groups).first().to_numpy(), name=df.index.name)
+    return candles
+
+
+# Function to pick the finest candle size that fits max_points; the label is
+# None when the bars are returned as they are
+def downsample_ohlc(df, max_points=MAX_POINTS):
+    if len(df) <= max_points:
+        return df, None
+    for label, period in CANDLE_FREQUENCIES:
+        candles = resample_ohlc(df, period)
+        if len(candles) <= max_points:
+            break
+    return candles, label
+
+
+# Function to choose which points of a line to keep with Largest-Triangle-Three-Buckets,
+# which preserves the visual peaks and troughs. Returns positions into x/y.
+def lttb_indices(x, y, max_points=MAX_POINTS):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').view('int64')
+    x = x.astype('float64')
+    y = np.asarray(y, dtype='float64')
+    valid = np.flatnonzero(~np.isnan(y))
+    n = len(valid)
+    if n <= max_points or max_points < 3:
+        return valid
+    x = x[valid] - x[valid[0]]
+    y = y[valid]
+
+    every = (n - 2) / (max_points - 2)
+    sampled = np.empty(max_points, dtype='int64')
+    sampled[0] = 0
+    a = 0
+    for i in range(max_points - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        sampled[i + 1] = a
+    sampled[-1] = n - 1
+    return valid[sampled]
+
+
+# Function to add candles, aggregated to fit the point budget. `label` names the
+# resolution of candles that were already aggregated by the caller.
+def add_candles(fig, df, max_points=MAX_POINTS, name='Candlestick', label=None, row=None, col=None):
+    import plotly.graph_objects as go
+
+    candles, resampled = downsample_ohlc(df, max_points)
+    label = resampled or label
+    if label is not None:
+        name = f'{name} ({label})'
+    fig.add_trace(go.Candlestick(x=candles.index, open=candles['Open'], high=candles['High'],
+                                 low=candles['Low'], close=candles['Close'], name=name), row=row, col=col)
+    count('traces')
+    count('points plotted', len(candles))
+    return candles
+
+
+# Function to add a line series thinned with LTTB, drawn with WebGL
+def add_line(fig, series, name, line=None, max_points=MAX_POINTS, row=None, col=None):
+    import plotly.graph_objects as go
+
+    keep = lttb_indices(series.index.values, series.to_numpy(), max_points)
+    fig.add_trace(go.Scattergl(x=series.index[keep], y=series.to_numpy()[keep], mode='lines', name=name,
+                               line=line), row=row, col=col)
+    count('traces')
+    count('points plotted', len(keep))
+
+
+# Function to add every signal of one type as a single WebGL marker trace
+def add_markers(fig, x, y, name, color, symbol, size=10, row=None, col=None):
+    import plotly.graph_objects as go
+
+    fig.add_trace(go.Scattergl(x=x, y=y, mode='markers', name=name,
+                               marker=dict(color=color, symbol=symbol, size=size)), row=row, col=col)
+    count('traces')
+    count('points plotted', len(x))
+
+
+# Function to draw a horizontal reference level as a shape instead of a data series
+def add_level(fig, y, label, color, dash='dash', width=2, row=None, col=None):
+    kwargs = {} if row is None else dict(row=row, col=col)
+    fig.add_hline(y=y, line=dict(color=color, width=width, dash=dash), annotation_text=label,
+                  annotation_position='top left', **kwargs)
@@ -0,0 +1,315 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage, count
+
+# Columns kept for every ticker, in the order they are stored on disk
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# Columns read_compact stores as COMPACT_DTYPE; Volume stays float64, where
+# float32 would round counts above 2**24
+PRICE_COLUMNS = COLUMNS[:-1]
+COMPACT_DTYPE = 'float32'
+
+# Where the store lives unless SIGNALS_STORE_DIR points somewhere else
+DEFAULT_ROOT = os.environ.get(
+    'SIGNALS_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ohlcv_store'))
+
+# yfinance style period strings accepted by read_period
+PERIOD_OFFSETS = {
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '2mo': pd.DateOffset(months=2),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '3y': pd.DateOffset(years=3),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+
+# Base class for anything that can supply OHLCV bars to the store
+class DataProvider:
+    def fetch(self, ticker, start, end, interval='1d'):
+        # Return a DataFrame indexed by timestamp with (a subset of) COLUMNS,
+        # covering start <= t < end
+        raise NotImplementedError
+
+
+# Provider backed by Yahoo Finance. yf.download reports failures by returning
+# nothing, so those are raised here; an empty frame means there are no bars.
+class YFinanceProvider(DataProvider):
+    def fetch(self, ticker, start, end, interval='1d'):
+        import yfinance as yf
+        data = yf.download(ticker, start=start, end=end, interval=interval, progress=False)
+        error = getattr(getattr(yf, 'shared', None), '_ERRORS', {}).get(ticker)
+        if not len(data) and error:
+            raise RuntimeError(f'{ticker}: {error}')
+        return data
+
+
+# Provider backed by the Yahoo chart API through a BulkFetcher, so concurrent
+# refreshes share its connection pool, rate limit and retries
+class ChartProvider(DataProvider):
+    def __init__(self, fetcher=None, **kwargs):
+        if fetcher is None:
+            from fetcher import BulkFetcher
+            fetcher = BulkFetcher(**kwargs)
+        self.fetcher = fetcher
+
+    def fetch(self, ticker, start, end, interval='1d'):
+        return self.fetcher.fetch(ticker, start, end, interval)
+
+
+# Provider backed by local CSV files named <ticker>.csv or <ticker>_<interval>.csv,
+# used offline and in tests instead of yfinance
+class CSVProvider(DataProvider):
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start, end, interval='1d'):
+        path = os.path.join(self.directory, f'{ticker}_{interval}.csv')
+        if not os.path.exists(path):
+            path = os.path.join(self.directory, f'{ticker}.csv')
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        data = data.sort_index()
+        return data[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+# Function to bring whatever a provider returned into the stored layout
+def normalize_frame(data):
+    if data is None or len(data) == 0:
+        return pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype='float64')
+    data = data.copy()
+    if isinstance(data.columns, pd.MultiIndex):
+        # Newer yfinance versions return (field, ticker) columns even for one ticker
+        data.columns = data.columns.get_level_values(0)
+    if 'Adj Close' not in data.columns:
+        data['Adj Close'] = data['Close']
+    data = data[COLUMNS].astype('float64')
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    data.index = index.rename('Date')
+    data = data[~data.index.duplicated(keep='last')]
+    return data.sort_index()
+
+
+# Function to turn a yfinance style period string into a start date
+def period_start(period, end=None):
+    end = pd.Timestamp(end or datetime.now())
+    if period == 'max':
+        return pd.Timestamp('1970-01-01')
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f'Unknown period {period!r}')
+    return end - PERIOD_OFFSETS[period]
+
+
+# On-disk columnar store of OHLCV bars keyed by (ticker, interval).
+#
+# Each series is kept as two .npy files (int64 nanosecond timestamps and a
+# float64 (rows x COLUMNS) block) that are memory-mapped on read, so slices are
+# zero-copy views. A small meta.json records which date range has already been
+# asked of the provider, so a refresh only fetches the bars that are missing.
+# Providers raise when a download fails; an empty answer means the range has no
+# bars and counts as checked.
+class OHLCVStore:
+    def __init__(self, root=DEFAULT_ROOT, provider=None, refresh_interval=timedelta(minutes=15)):
+        self.root = root
+        self.provider = provider or YFinanceProvider()
+        # How stale the newest check may be before the tail is fetched again
+        self.refresh_interval = refresh_interval
+        # One lock per series, so different tickers can be refreshed at the same time
+        self._lock = threading.Lock()
+        self._series_locks = {}
+
+    def _series_lock(self, ticker, interval):
+        with self._lock:
+            return self._series_locks.setdefault((ticker, interval), threading.Lock())
+
+    def _directory(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker.replace('/', '_'))
+
+    def _load_meta(self, directory):
+        path = os.path.join(directory, 'meta.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _load(self, ticker, interval):
+        directory = self._directory(ticker, interval)
+        meta = self._load_meta(directory)
+        if meta is None:
+            return None, None, None
+        version = meta['version']
+        index = np.load(os.path.join(directory, f'index.{version}.npy'), mmap_mode='r')
+        values = np.load(os.path.join(directory, f'values.{version}.npy'), mmap_mode='r')
+        return meta, index, values
+
+    def _save(self, directory, meta, data):
+        os.makedirs(directory, exist_ok=True)
+        # Every write goes to a new version so readers holding a memory map of the
+        # previous one are never disturbed (and Windows can't replace mapped files)
+        version = (meta or {}).get('version', 0) + 1
+        index = data.index.values.astype('datetime64[ns]').view('int64')
+        np.save(os.path.join(directory, f'index.{version}.npy'), index)
+        np.save(os.path.join(directory, f'values.{version}.npy'), data.to_numpy(dtype='float64'))
+        new_meta = dict(meta or {})
+        new_meta['version'] = version
+        self._save_meta(directory, new_meta)
+        for name in os.listdir(directory):
+            parts = name.split('.')
+            if len(parts) == 3 and parts[2] == 'npy' and parts[1] != str(version):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    # Still mapped by a reader on Windows, retried on the next write
+                    pass
+        return new_meta
+
+    # Write meta.json alone, e.g. to record a checked range that added no bars
+    def _save_meta(self, directory, meta):
+        tmp_path = os.path.join(directory, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+
+    def _frame(self, index, values):
+        return pd.DataFrame(values, index=pd.DatetimeIndex(index.view('datetime64[ns]'), name='Date'),
+                            columns=COLUMNS, copy=False)
+
+    # Ask the provider for [start, end), timed as the run's 'download' stage
+    def _fetch(self, ticker, start, end, interval):
+        with stage('download'):
+            data = normalize_frame(self.provider.fetch(ticker, start, end, interval))
+        count('rows downloaded', len(data))
+        return data
+
+    # Whether a fetched piece has bars the stored series lacks or holds differently
+    def _changes(self, index, values, piece):
+        stamps = piece.index.values.astype('datetime64[ns]').view('int64')
+        rows = np.searchsorted(index, stamps)
+        if (rows >= len(index)).any() or not np.array_equal(index[rows], stamps):
+            return True
+        return not np.array_equal(values[rows], piece.to_numpy(dtype='float64'), equal_nan=True)
+
+    # Fetch any bars in [start, end) that the store has not asked the provider for yet
+    def refresh(self, ticker, start, end=None, interval='1d'):
+        now = datetime.now()
+        start = pd.Timestamp(start)
+        end = min(pd.Timestamp(end or now), pd.Timestamp(now))
+        directory = self._directory(ticker, interval)
+
+        with self._series_lock(ticker, interval):
+            meta, index, values = self._load(ticker, interval)
+            if meta is None:
+                data = self._fetch(ticker, start, end, interval)
+                self._save(directory, {'checked_from': start.isoformat(), 'checked_until': end.isoformat()}, data)
+                return
+
+            checked_from = pd.Timestamp(meta['checked_from'])
+            checked_until = pd.Timestamp(meta['checked_until'])
+            pieces = []
+            if start < checked_from:
+                pieces.append(self._fetch(ticker, start, checked_from, interval))
+                meta['checked_from'] = start.isoformat()
+            if end - checked_until > self.refresh_interval:
+                # Start from the last stored bar so a partial (intraday) bar gets replaced
+                tail_start = pd.Timestamp(index[-1]) if len(index) else checked_until
+                pieces.append(self._fetch(ticker, min(tail_start, checked_until), end, interval))
+                meta['checked_until'] = end.isoformat()
+            if not pieces:
+                return
+
+            pieces = [piece for piece in pieces if len(piece) and self._changes(index, values, piece)]
+            if not pieces:
+                # Nothing new: only the checked range moves, the bars (and their version) stay
+                self._save_meta(directory, meta)
+                return
+            data = pd.concat([self._frame(index, values)] + pieces)
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            self._save(directory, meta, data)
+
+    # Refresh many tickers concurrently (a watchlist, a universe) so their
+    # downloads overlap. Returns {ticker: error message} for the ones that failed.
+    def refresh_many(self, tickers, start, end=None, interval='1d', max_workers=8):
+        tickers = list(dict.fromkeys(tickers))
+        errors = {}
+        if not tickers:
+            return errors
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as pool:
+            futures = {ticker: pool.submit(self.refresh, ticker, start, end, interval) for ticker in tickers}
+            for ticker, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[ticker] = f'{type(e).__name__}: {e}'
+        return errors
+
+    # Return the stored bars in [start, end) as a DataFrame backed by the memory map
+    def read(self, ticker, start, end=None, interval='1d', refresh=True):
+        if refresh:
+            self.refresh(ticker, start, end, interval)
+        meta, index, values = self._load(ticker, interval)
+        if meta is None:
+            return normalize_frame(None)
+        lo = np.searchsorted(index, pd.Timestamp(start).value, side='left')
+        hi = len(index) if end is None else np.searchsorted(index, pd.Timestamp(end).value, side='left')
+        count('rows read', hi - lo)
+        return self._frame(index[lo:hi], values[lo:hi])
+
+    # Return the whole stored series as memory-mapped arrays, plus the stored
+    # version: int64 nanosecond timestamps, COMPACT_DTYPE (rows x PRICE_COLUMNS)
+    # prices and the float64 (rows x 1) Volume column of the stored values. The
+    # compact file is written once per version, so every process maps the same
+    # pages. Returns (None, None, None, None) for an unknown series.
+    def read_compact(self, ticker, interval='1d'):
+        directory = self._directory(ticker, interval)
+        with self._series_lock(ticker, interval):
+            meta, index, values = self._load(ticker, interval)
+            if meta is None:
+                return None, None, None, None
+            version = meta['version']
+            path = os.path.join(directory, f'prices.{version}.npy')
+            if not os.path.exists(path):
+                # Written under a temporary name so other processes never map a partial file
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, np.asarray(values[:, :len(PRICE_COLUMNS)], dtype=COMPACT_DTYPE))
+                os.replace(tmp_path, path)
+            return version, index, np.load(path, mmap_mode='r'), values[:, len(PRICE_COLUMNS):]
+
+    # Same as read, but with a yfinance style period ('1mo', '1y', ...) ending now
+    def read_period(self, ticker, period='1y', interval='1d', refresh=True):
+        end = datetime.now()
+        return self.read(ticker, period_start(period, end), end, interval=interval, refresh=refresh)
+
+
+_default_store = None
+
+
+# Function to get the store shared by every app in this process. It downloads
+# from the chart API (SIGNALS_CHART_URL can point it at a stand-in server);
+# setting SIGNALS_PROVIDER_DIR swaps that for CSV files in that directory.
+def get_store():
+    global _default_store
+    if _default_store is None:
+        provider_dir = os.environ.get('SIGNALS_PROVIDER_DIR')
+        if provider_dir:
+            provider = CSVProvider(provider_dir)
+        elif os.environ.get('SIGNALS_CHART_URL'):
+            provider = ChartProvider(base_url=os.environ['SIGNALS_CHART_URL'])
+        else:
+            provider = ChartProvider()
+        _default_store = OHLCVStore(provider=provider)
+    return _default_store
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# Largest EMA length offered by the sliders in signals.py
+MAX_SPAN = 200
+
+
+# Function to calculate the EMA of every span from 1 to max_span in one pass.
+# Column k holds the EMA with span k + 1, identical to
+# data['Close'].ewm(span=k + 1, adjust=False).mean().
+@timed
+def ema_matrix(close, max_span=MAX_SPAN):
+    values = np.asarray(close, dtype='float64')
+    spans = np.arange(1, max_span + 1)
+    if np.isnan(values).any():
+        # pandas re-weights around missing values; let it handle those series
+        series = pd.Series(values)
+        return np.column_stack([series.ewm(span=span, adjust=False).mean().to_numpy() for span in spans])
+
+    # Same alpha pandas derives from span (via the centre of mass)
+    alpha = 1.0 / (1.0 + (spans - 1.0) / 2.0)
+    decay = 1.0 - alpha
+    ema = np.empty((len(values), max_span))
+    if len(values) == 0:
+        return ema
+    ema[0] = values[0]
+    for t in range(1, len(values)):
+        # pandas keeps the previous value untouched when the new price equals it
+        ema[t] = np.where(ema[t - 1] == values[t], ema[t - 1],
+                          (decay * ema[t - 1] + alpha * values[t]) / (decay + alpha))
+    return ema
+
+
+# Function to evaluate the crossover strategy for every (ema1, ema2) pair.
+# The strategy holds from the close of a buy bar (EMA1 crossing above EMA2) to
+# the close of the next sell bar, like generate_signals. Returns two
+# max_span x max_span frames indexed by EMA1 length with EMA2 lengths as columns:
+# the total return in percent and the number of buy signals.
+@timed
+def sweep_crossovers(close, ema=None, chunk=20):
+    close = np.asarray(close, dtype='float64')
+    if ema is None:
+        ema = ema_matrix(close)
+    max_span = ema.shape[1]
+    log_returns = np.diff(np.log(close))
+
+    total_return = np.empty((max_span, max_span))
+    buy_count = np.empty((max_span, max_span), dtype='int64')
+    # Chunks of EMA1 spans keep the (time x ema1 x ema2) mask within a few MB
+    for first in range(0, max_span, chunk):
+        last = min(first + chunk, max_span)
+        signal = ema[:, first:last, None] > ema[:, None, :]
+        # Held on bar t + 1 when the signal was on at bar t
+        total_return[first:last] = np.einsum('t,tij->ij', log_returns, signal[:-1])
+        buy_count[first:last] = (signal[1:] & ~signal[:-1]).sum(axis=0)
+
+    spans = pd.RangeIndex(1, max_span + 1)
+    returns = pd.DataFrame(np.expm1(total_return) * 100, index=spans.rename('EMA1'), columns=spans.rename('EMA2'))
+    buys = pd.DataFrame(buy_count, index=spans.rename('EMA1'), columns=spans.rename('EMA2'))
+    return returns, buys
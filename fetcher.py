@@ -0,0 +1,215 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Yahoo Finance chart API (v8), the endpoint yfinance itself downloads from
+YAHOO_CHART_URL = 'https://query2.finance.yahoo.com/v8/finance/chart'
+
+# Yahoo rejects requests without a browser-like user agent
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+# Intervals whose bars are whole days, stamped at midnight like yf.download does
+DAILY_INTERVALS = {'1d', '5d', '1wk', '1mo', '3mo'}
+
+# Status codes worth retrying: throttling and server-side failures
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# Raised (or reported per symbol by fetch_many) when a ticker can't be downloaded
+class FetchError(Exception):
+    def __init__(self, ticker, message, status=None):
+        super().__init__(f'{ticker}: {message}')
+        self.ticker = ticker
+        self.status = status
+
+
+# Token bucket shared by every worker thread: `rate` requests per second on
+# average, with bursts of up to `burst` requests. A rate of None means no limit.
+class RateLimiter:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate or 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Block until a request may be sent
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Function to turn a chart API response into an OHLCV frame like yf.download's
+def parse_chart(ticker, payload, interval='1d'):
+    chart = payload.get('chart') or {}
+    if chart.get('error'):
+        raise FetchError(ticker, chart['error'].get('description') or chart['error'].get('code'))
+    if not chart.get('result'):
+        raise FetchError(ticker, 'empty chart response')
+    result = chart['result'][0]
+    timestamps = result.get('timestamp') or []
+    quote = (result.get('indicators', {}).get('quote') or [{}])[0]
+    adjclose = (result.get('indicators', {}).get('adjclose') or [{}])[0].get('adjclose')
+
+    def column(values):
+        return np.array([np.nan if value is None else value for value in (values or [None] * len(timestamps))],
+                        dtype='float64')
+
+    data = pd.DataFrame({
+        'Open': column(quote.get('open')),
+        'High': column(quote.get('high')),
+        'Low': column(quote.get('low')),
+        'Close': column(quote.get('close')),
+        'Adj Close': column(adjclose or quote.get('close')),
+        'Volume': column(quote.get('volume')),
+    }, index=pd.to_datetime(np.asarray(timestamps, dtype='int64'), unit='s', utc=True))
+
+    # Exchange-local timestamps, whole dates for daily and longer bars
+    index = data.index.tz_convert(chart_timezone(payload)).tz_localize(None)
+    if interval in DAILY_INTERVALS:
+        index = index.normalize()
+    data.index = index.rename('Date')
+    return data.dropna(how='all', subset=['Open', 'High', 'Low', 'Close'])
+
+
+# Function to get the exchange timezone named in a chart API response
+def chart_timezone(payload):
+    try:
+        meta = payload['chart']['result'][0].get('meta') or {}
+    except (KeyError, IndexError, TypeError):
+        return 'UTC'
+    return meta.get('exchangeTimezoneName') or 'UTC'
+
+
+# Function to turn a start/end time into (exchange-local naive time, epoch
+# seconds). Naive times are read as exchange-local, like the bars themselves;
+# aware ones are converted.
+def exchange_time(value, timezone):
+    value = pd.Timestamp(value)
+    if value.tz is None:
+        return value, int(value.tz_localize(timezone, ambiguous=True, nonexistent='shift_forward').timestamp())
+    return value.tz_convert(timezone).tz_localize(None), int(value.timestamp())
+
+
+# Downloads OHLCV bars for many tickers at once from the chart API. Requests go
+# out from a thread pool over one pooled HTTP session, throttled by a shared
+# token bucket, and throttled/failed requests are retried with exponential
+# backoff. base_url can point at a local stand-in server (see replay_server.py).
+class BulkFetcher:
+    def __init__(self, base_url=YAHOO_CHART_URL, max_workers=8, rate=5.0, burst=None, retries=3,
+                 backoff=0.5, max_backoff=30.0, timeout=10.0, session=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # Exchange timezone of every ticker seen so far
+        self.timezones = {}
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+        self.session = session
+
+    # Delay before retry number `attempt` (0-based), with jitter so throttled
+    # workers don't all come back at the same moment
+    def _delay(self, attempt, retry_after=None):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    # Download the bars of one ticker with start <= t < end. Naive times are in
+    # the exchange's timezone; until a ticker's exchange is known they are read
+    # as UTC, and asked again if the answer shows another timezone.
+    def fetch(self, ticker, start, end, interval='1d'):
+        timezone = self.timezones.get(ticker, 'UTC')
+        payload = self._get(ticker, start, end, interval, timezone)
+        if chart_timezone(payload) != timezone:
+            timezone = self.timezones[ticker] = chart_timezone(payload)
+            if pd.Timestamp(start).tz is None or pd.Timestamp(end).tz is None:
+                payload = self._get(ticker, start, end, interval, timezone)
+        data = parse_chart(ticker, payload, interval)
+        start, end = exchange_time(start, timezone)[0], exchange_time(end, timezone)[0]
+        return data[(data.index >= start) & (data.index < end)]
+
+    # Request the bars of [start, end) with retries; returns the response body
+    def _get(self, ticker, start, end, interval, timezone):
+        import requests
+
+        params = {
+            'period1': exchange_time(start, timezone)[1],
+            'period2': exchange_time(end, timezone)[1],
+            'interval': interval,
+            'includePrePost': 'false',
+            'events': 'div,splits',
+        }
+        url = f'{self.base_url}/{ticker}'
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = FetchError(ticker, f'{type(e).__name__}: {e}')
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                error = FetchError(ticker, f'HTTP {response.status_code}: {_error_description(response)}',
+                                   response.status_code)
+                if response.status_code not in RETRY_STATUS:
+                    raise error
+                retry_after = response.headers.get('Retry-After')
+            if attempt < self.retries:
+                time.sleep(self._delay(attempt, retry_after))
+        raise error
+
+    # Download many tickers concurrently. Returns ({ticker: frame}, {ticker: error
+    # message}); a failing ticker never stops the others.
+    def fetch_many(self, tickers, start, end, interval='1d'):
+        tickers = list(dict.fromkeys(tickers))
+        frames, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(tickers)))) as pool:
+            futures = {ticker: pool.submit(self.fetch, ticker, start, end, interval) for ticker in tickers}
+            for ticker, future in futures.items():
+                try:
+                    frames[ticker] = future.result()
+                except Exception as e:
+                    errors[ticker] = f'{type(e).__name__}: {e}'
+        return frames, errors
+
+    def close(self):
+        self.session.close()
+
+
+# Function to get the most useful error text out of a failed chart API response
+def _error_description(response):
+    try:
+        error = response.json()['chart']['error']
+        return error.get('description') or error.get('code')
+    except Exception:
+        return response.reason or response.text[:200]
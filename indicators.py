@@ -0,0 +1,159 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from patterns import BULLISH_ENGULFING, BEARISH_ENGULFING, pattern_bitmask, has_pattern
+from instrumentation import timed
+
+# Function to calculate William's %R
+@timed
+def williams_r(df, period=14):
+    highest_high = df['High'].rolling(window=period).max()
+    lowest_low = df['Low'].rolling(window=period).min()
+    wr = (highest_high - df['Close']) / (highest_high - lowest_low) * -100
+    return wr
+
+# Function to pick the most touched level; ties resolve the same way as
+# max(set(levels), key=levels.count) but with one hash-based count
+def most_common_level(levels):
+    counts = Counter(levels)
+    return max(set(levels), key=counts.__getitem__)
+
+# Function to find the pivot lows/highs: bars that are the extreme of the
+# window reaching `period` bars either side of them. Works on a single series
+# or on a (time x ticker) frame.
+def pivot_masks(lows, highs, period):
+    window = 2 * period + 1
+    low_period = lows.rolling(window=window, center=True, min_periods=1).min()
+    high_period = highs.rolling(window=window, center=True, min_periods=1).max()
+
+    # Only bars with a full window on both sides qualify
+    valid = np.zeros(len(lows), dtype=bool)
+    valid[period:len(lows) - period] = True
+    if lows.ndim == 2:
+        valid = valid[:, None]
+
+    support_mask = (lows.to_numpy() == low_period.to_numpy()) & valid
+    resistance_mask = (highs.to_numpy() == high_period.to_numpy()) & valid
+    return support_mask, resistance_mask
+
+# Function to summarise the pivot levels of one ticker
+def summarize_levels(support_levels, resistance_levels):
+    lowest_support = support_levels.min() if len(support_levels) else None
+    highest_resistance = resistance_levels.max() if len(resistance_levels) else None
+    most_support = most_common_level(support_levels) if len(support_levels) else None
+    most_resistance = most_common_level(resistance_levels) if len(resistance_levels) else None
+    return lowest_support, most_support, highest_resistance, most_resistance
+
+# Function to calculate support and resistance levels based on most price touches.
+# Given a (field, ticker) column panel, as returned by yf.download for several
+# tickers, it returns a dict of the same tuple per ticker.
+@timed
+def identify_support_resistance_levels(df, period):
+    lows = df['Low']
+    highs = df['High']
+    if lows.ndim == 2:
+        highs = highs[lows.columns]
+    support_mask, resistance_mask = pivot_masks(lows, highs, period)
+
+    if lows.ndim == 1:
+        return summarize_levels(lows.to_numpy()[support_mask], highs.to_numpy()[resistance_mask])
+
+    low_values = lows.to_numpy()
+    high_values = highs.to_numpy()
+    return {ticker: summarize_levels(low_values[support_mask[:, j], j], high_values[resistance_mask[:, j], j])
+            for j, ticker in enumerate(lows.columns)}
+
+# Function to turn a level (or per-ticker levels) into something that broadcasts
+# against the price columns; a missing level never triggers a signal
+def level_values(level, columns=None):
+    if columns is None:
+        return np.nan if level is None else level
+    if not isinstance(level, (dict, pd.Series)):
+        level = {ticker: level for ticker in columns}
+    return pd.Series(level, dtype='float64').reindex(columns)
+
+# Function to generate buy/sell signals based on Williams %R and Support/Resistance levels.
+# Returns the index labels of the buy and sell bars. For a (field, ticker) panel the
+# levels may be given per ticker (dict or Series) and the labels come back per ticker.
+@timed
+def generate_trading_signals(df, most_support, most_resistance):
+    wr = df['Williams %R']
+    prev_wr = wr.shift(1)
+    columns = wr.columns if wr.ndim == 2 else None
+    support = level_values(most_support, columns)
+    resistance = level_values(most_resistance, columns)
+    lows = df['Low'] if columns is None else df['Low'][columns]
+    highs = df['High'] if columns is None else df['High'][columns]
+
+    # Buy Signal: Williams %R crosses above -80 and price touches support
+    buy_mask = ((prev_wr < -80) & (wr > -80) & (lows <= support)).to_numpy()
+
+    # Sell Signal: Williams %R crosses below -20 and price touches resistance
+    sell_mask = ((prev_wr > -20) & (wr < -20) & (highs >= resistance)).to_numpy()
+
+    if columns is None:
+        return df.index[buy_mask], df.index[sell_mask]
+
+    buy_signals = {ticker: df.index[buy_mask[:, j]] for j, ticker in enumerate(columns)}
+    sell_signals = {ticker: df.index[sell_mask[:, j]] for j, ticker in enumerate(columns)}
+    return buy_signals, sell_signals
+
+@timed
+def calculate_ema(data, period):
+    return data['Close'].ewm(span=period, adjust=False).mean()
+
+# When a precomputed ema_matrix (column k = span k + 1) is passed the EMAs are
+# read from it instead of being recalculated
+@timed
+def generate_signals(data, ema1_period, ema2_period, ema=None):
+    if ema is None:
+        data['EMA1'] = calculate_ema(data, ema1_period)
+        data['EMA2'] = calculate_ema(data, ema2_period)
+    else:
+        data['EMA1'] = ema[:, ema1_period - 1]
+        data['EMA2'] = ema[:, ema2_period - 1]
+    
+    # Generate signals
+    data['Signal'] = 0
+    data['Signal'] = np.where(data['EMA1'] > data['EMA2'], 1, 0)
+    data['Position'] = data['Signal'].diff()
+    
+    # Buy and Sell signals
+    buy_signals = data[data['Position'] == 1]
+    sell_signals = data[data['Position'] == -1]
+    
+    return buy_signals, sell_signals
+
+# Function to identify bullish after bearish candles and bearish engulfing signals.
+# Returns a new frame with those two columns plus the full 'Patterns' bitmask
+# (see patterns.py); the input is left untouched.
+@timed
+def identify_candle_patterns(df):
+    mask = pattern_bitmask(df['Open'].to_numpy(), df['High'].to_numpy(),
+                           df['Low'].to_numpy(), df['Close'].to_numpy())
+    return df.assign(**{
+        'Bullish After Bearish': has_pattern(mask, BULLISH_ENGULFING),
+        'Bearish Engulfing': has_pattern(mask, BEARISH_ENGULFING),
+        'Patterns': mask,
+    })
+
+# Function to add buy and sell signals
+@timed
+def add_signals(data, most_support, most_resistance, percentage):
+    # Calculate thresholds
+    buy_threshold_high = most_support * (1 + percentage / 100)  # Buy threshold above most support
+    buy_threshold_low = most_support * (1 - percentage / 100)   # Buy threshold below most support
+    sell_threshold_high = most_resistance * (1 + percentage / 100)  # Sell threshold above most resistance
+    sell_threshold_low = most_resistance * (1 - percentage / 100)   # Sell threshold below most resistance
+
+    # Buy when the closing price is within the defined range around the support
+    buy_signal = (data['Close'] <= buy_threshold_high) & (data['Close'] >= buy_threshold_low)
+
+    # Sell when the closing price is within the defined range around the resistance
+    sell_signal = (data['Close'] >= sell_threshold_low) & (data['Close'] <= sell_threshold_high)
+
+    data['Buy'] = buy_signal
+    data['Sell'] = sell_signal
+    return data
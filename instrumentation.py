@@ -0,0 +1,228 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Off unless SIGNALS_INSTRUMENT=1 (or enable() is called); when off, stage()
+# and @timed cost one flag check
+_enabled = os.environ.get('SIGNALS_INSTRUMENT', '') not in ('', '0')
+
+# Every finished run is appended here as one JSON line, if set
+METRICS_FILE = os.environ.get('SIGNALS_METRICS_FILE')
+
+# Port of the Prometheus text endpoint (/metrics), if set
+METRICS_PORT = os.environ.get('SIGNALS_METRICS_PORT')
+
+# Address the endpoint listens on; local only unless set (e.g. to 0.0.0.0)
+METRICS_HOST = os.environ.get('SIGNALS_METRICS_HOST', '127.0.0.1')
+
+# Finished runs kept in memory
+HISTORY_SIZE = 1000
+
+_NULL_STAGE = contextlib.nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY_SIZE)
+# (app, stage) -> [calls, seconds] and (app, counter) -> total, across runs
+_stage_totals = {}
+_counter_totals = {}
+_server = None
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def is_enabled():
+    return _enabled
+
+
+# Timings and counters of one script run (one rerun of one app in one session)
+class Run:
+    def __init__(self, app):
+        self.app = app
+        self.started = datetime.now()
+        self.seconds = 0.0
+        self.stages = []      # [name, depth, seconds] in start order
+        self.counters = {}
+        self.depth = 0
+        self._start = time.perf_counter()
+
+    def to_dict(self):
+        return {
+            'app': self.app,
+            'started': self.started.isoformat(timespec='milliseconds'),
+            'seconds': self.seconds,
+            'stages': [{'stage': name, 'depth': depth, 'seconds': seconds} for name, depth, seconds in self.stages],
+            'counters': self.counters,
+        }
+
+
+# Times a block into the run of the current thread
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.run = getattr(_local, 'run', None)
+        if self.run is not None:
+            self.record = [self.name, self.run.depth, 0.0]
+            self.run.stages.append(self.record)
+            self.run.depth += 1
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.run is not None:
+            self.record[2] = time.perf_counter() - self.start
+            self.run.depth -= 1
+
+
+# Context manager timing a stage of the current run: `with stage('download'): ...`
+def stage(name):
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+# Decorator timing every call of a function as a stage named after it
+def timed(func=None, *, name=None):
+    if func is None:
+        return functools.partial(timed, name=name)
+    label = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with _Stage(label):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+# Function to add to a counter of the current run (rows processed, traces drawn, ...)
+def count(name, n=1):
+    if not _enabled:
+        return
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.counters[name] = run.counters.get(name, 0) + int(n)
+
+
+# Function to start recording a run of `app` in this thread
+def start_run(app):
+    if not _enabled:
+        return None
+    if METRICS_PORT:
+        serve_metrics(int(METRICS_PORT), METRICS_HOST)
+    _local.run = Run(app)
+    return _local.run
+
+
+# Function to finish the run of this thread: adds it to the history and the
+# totals, appends it to METRICS_FILE and returns it (None when disabled)
+def finish_run():
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return None
+    _local.run = None
+    run.seconds = time.perf_counter() - run._start
+    with _lock:
+        _history.append(run)
+        for name, depth, seconds in run.stages:
+            totals = _stage_totals.setdefault((run.app, name), [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+        totals = _stage_totals.setdefault((run.app, 'run'), [0, 0.0])
+        totals[0] += 1
+        totals[1] += run.seconds
+        for name, value in run.counters.items():
+            _counter_totals[(run.app, name)] = _counter_totals.get((run.app, name), 0) + value
+        if METRICS_FILE:
+            with open(METRICS_FILE, 'a') as f:
+                f.write(json.dumps(run.to_dict()) + '\n')
+    return run
+
+
+# Function to finish the run and show its breakdown in a collapsed sidebar
+# expander; call it last in an app
+def sidebar_report():
+    run = finish_run()
+    if run is None:
+        return None
+    import streamlit as st
+
+    with st.sidebar.expander(f'Performance: {run.seconds * 1000:.0f} ms', expanded=False):
+        st.dataframe([{'Stage': '\u2003' * depth + name, 'ms': round(seconds * 1000, 2)}
+                      for name, depth, seconds in run.stages], hide_index=True)
+        if run.counters:
+            st.dataframe([{'Counter': name, 'Value': value} for name, value in run.counters.items()],
+                         hide_index=True)
+    return run
+
+
+# Function to write runs (default: the in-memory history) as JSON lines
+def export_jsonl(path, runs=None):
+    with _lock:
+        runs = list(_history if runs is None else runs)
+    with open(path, 'w') as f:
+        for run in runs:
+            f.write(json.dumps(run.to_dict()) + '\n')
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Function to render the totals across runs in the Prometheus text format
+def prometheus_text():
+    with _lock:
+        stages = sorted(_stage_totals.items())
+        counters = sorted(_counter_totals.items())
+    lines = ['# HELP signals_stage_seconds Time spent in each stage of each app.',
+             '# TYPE signals_stage_seconds summary']
+    for (app, name), (calls, seconds) in stages:
+        labels = f'app="{_label(app)}",stage="{_label(name)}"'
+        lines.append(f'signals_stage_seconds_sum{{{labels}}} {seconds:.6f}')
+        lines.append(f'signals_stage_seconds_count{{{labels}}} {calls}')
+    lines += ['# HELP signals_items_total Rows, traces and other items processed by each app.',
+              '# TYPE signals_items_total counter']
+    for (app, name), value in counters:
+        lines.append(f'signals_items_total{{app="{_label(app)}",name="{_label(name)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# Function to serve prometheus_text() at http://host:port/metrics from a
+# background thread (once per process)
+def serve_metrics(port, host='127.0.0.1'):
+    global _server
+    with _lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                content = prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
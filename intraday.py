@@ -0,0 +1,153 @@
+from collections import deque
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data_store import COLUMNS, get_store, normalize_frame
+from indicators import williams_r, identify_candle_patterns
+from instrumentation import count
+
+# Intraday analysis as a generator pipeline, one chunk of bars at a time:
+#
+#   chunks = provider_chunks('AAPL', start, end)           # minute bars
+#   candles = resample_stream(chunks, '15m')               # 15 minute candles
+#   rows = indicator_stream(candles)                       # + Williams %R, EMAs, patterns
+#   recent = collect_tail(rows, 2000)                      # the last 2000 candles
+#
+# No stage holds more than a chunk plus a few bars of context, so memory stays
+# the same however long the span is.
+
+# Candle sizes offered by the apps, as pandas frequencies
+CANDLE_INTERVALS = {'5m': '5min', '15m': '15min', '30m': '30min', '1h': '1h', '1d': '1D'}
+
+# Bars per chunk read from the store or a CSV file
+CHUNK_ROWS = 100_000
+
+# Time span per provider request (the chart API serves 1m bars a week at a time)
+CHUNK_SPAN = timedelta(days=7)
+
+# Candles kept by intraday_history
+MAX_ROWS = 5000
+
+# How far back the chart API serves bars of each intraday interval
+INTRADAY_LIMITS = {'1m': timedelta(days=29), '2m': timedelta(days=59), '5m': timedelta(days=59),
+                   '15m': timedelta(days=59), '30m': timedelta(days=59), '1h': timedelta(days=729)}
+
+# Columns of the candles intraday_history returns, even when there are none
+HISTORY_COLUMNS = COLUMNS + ['Bullish After Bearish', 'Bearish Engulfing', 'Patterns', 'Williams %R', 'EMA1', 'EMA2']
+
+# How each column combines when bars (or partial candles) merge into one candle
+AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Adj Close': 'last', 'Volume': 'sum'}
+
+
+# Function to yield the bars of [start, end) straight from a provider, one
+# `span` at a time, without storing them. A span the provider fails on is
+# skipped; (span start, error message) pairs are appended to `errors` if given.
+def provider_chunks(ticker, start, end, interval='1m', span=CHUNK_SPAN, provider=None, errors=None):
+    provider = provider or get_store().provider
+    chunk_start, end = pd.Timestamp(start), pd.Timestamp(end)
+    while chunk_start < end:
+        chunk_end = min(chunk_start + span, end)
+        try:
+            data = normalize_frame(provider.fetch(ticker, chunk_start, chunk_end, interval))
+        except Exception as e:
+            count('failed chunks')
+            if errors is not None:
+                errors.append((chunk_start, f'{type(e).__name__}: {e}'))
+            chunk_start = chunk_end
+            continue
+        count('minute bars', len(data))
+        if len(data):
+            yield data
+        chunk_start = chunk_end
+
+
+# Function to yield stored bars of [start, end) in chunks of `rows`; the chunks
+# are views of the store's memory map
+def stored_chunks(ticker, start, end=None, interval='1m', rows=CHUNK_ROWS, store=None):
+    data = (store or get_store()).read(ticker, start, end, interval, refresh=False)
+    for first in range(0, len(data), rows):
+        count('minute bars', min(rows, len(data) - first))
+        yield data.iloc[first:first + rows]
+
+
+# Function to yield the bars of a (possibly huge) CSV file, e.g. a vendor's
+# minute history, in chunks of `rows`
+def csv_chunks(path, rows=CHUNK_ROWS):
+    for data in pd.read_csv(path, index_col=0, parse_dates=True, chunksize=rows):
+        data = normalize_frame(data)
+        count('minute bars', len(data))
+        yield data
+
+
+# Function to aggregate a stream of bars into candles of `interval` ('15m',
+# '1h', ... or any fixed pandas frequency). Chunks must come in time order; the
+# last candle of a chunk is held back until the next chunk shows it is complete.
+def resample_stream(chunks, interval):
+    freq = CANDLE_INTERVALS.get(interval, interval)
+    carry = None
+    for data in chunks:
+        if not len(data):
+            continue
+        candles = data.groupby(data.index.floor(freq)).agg(AGGREGATIONS)
+        if carry is not None:
+            candles = pd.concat([carry, candles]).groupby(level=0).agg(AGGREGATIONS)
+        carry = candles.iloc[-1:]
+        if len(candles) > 1:
+            yield candles.iloc[:-1].rename_axis('Date')
+    if carry is not None:
+        yield carry.rename_axis('Date')
+
+
+# Function to add Williams %R, two EMAs and the candle patterns to a stream of
+# candles. Each chunk is run through the usual indicator functions together
+# with the candles it needs from before it, so the results equal those of the
+# whole series at once.
+def indicator_stream(candles, wr_period=14, ema1_period=12, ema2_period=26):
+    context = None
+    emas = {}
+    for data in candles:
+        if not len(data):
+            continue
+        frame = data if context is None else pd.concat([context, data])
+        skip = len(frame) - len(data)
+        columns = {'Williams %R': williams_r(frame, wr_period).iloc[skip:]}
+        for column, span in (('EMA1', ema1_period), ('EMA2', ema2_period)):
+            close = data['Close']
+            if column in emas:
+                # Seeding with the previous EMA continues the adjust=False recurrence
+                close = pd.concat([pd.Series([emas[column]], index=close.index[:1]), close])
+            ema = close.ewm(span=span, adjust=False).mean().iloc[-len(data):]
+            columns[column] = ema
+            emas[column] = float(ema.iloc[-1])
+        context = frame[COLUMNS].iloc[-max(wr_period - 1, 1):]
+        data = identify_candle_patterns(frame).iloc[skip:].assign(**columns)
+        count('candles', len(data))
+        yield data
+
+
+# Function to keep only the last `rows` rows of a stream of frames; an empty
+# stream gives an empty frame with `columns`
+def collect_tail(chunks, rows=MAX_ROWS, columns=COLUMNS):
+    tail, kept = deque(), 0
+    for data in chunks:
+        tail.append(data.iloc[-rows:])
+        kept += len(tail[-1])
+        while kept - len(tail[0]) >= rows:
+            kept -= len(tail.popleft())
+    if not tail:
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='Date'), dtype='float64')
+    return pd.concat(tail).iloc[-rows:]
+
+
+# Function to run the whole pipeline for one ticker: minute bars from the
+# provider, `interval` candles with indicators, the last max_rows of them. The
+# start is moved up to what the chart API still serves for source_interval.
+# Chunks the provider fails on are left out and listed in `errors`, if given.
+def intraday_history(ticker, start, end, interval='15m', source_interval='1m', max_rows=MAX_ROWS,
+                     wr_period=14, ema1_period=12, ema2_period=26, provider=None, errors=None):
+    if source_interval in INTRADAY_LIMITS:
+        start = max(pd.Timestamp(start), pd.Timestamp(datetime.now()) - INTRADAY_LIMITS[source_interval])
+    chunks = provider_chunks(ticker, start, end, source_interval, provider=provider, errors=errors)
+    candles = resample_stream(chunks, interval)
+    return collect_tail(indicator_stream(candles, wr_period, ema1_period, ema2_period), max_rows, HISTORY_COLUMNS)
@@ -0,0 +1,250 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from indicators import pivot_masks
+from streaming import bar_value
+
+KINDS = ['support', 'resistance']
+LEVEL_COLUMNS = ['Level', 'Kind', 'Pivots', 'Touches']
+
+# Log-price span reserved per ticker in UniverseLevels' combined search keys
+# (far wider than any price range) and the offset keeping keys positive
+_KEY_SPAN = 100.0
+_KEY_OFFSET = 50.0
+
+# Values (bars x tickers) per block when building from a panel
+PANEL_CHUNK_CELLS = 1 << 22
+
+
+# Support/resistance levels of one ticker, built from its pivot lows and highs
+# (the bars identify_support_resistance_levels looks at).
+#
+# Pivots fall into buckets of `tolerance` percent on a fixed log-price grid, so
+# a new pivot only bumps one bucket. A level is a bucket's mean pivot price;
+# its touches are all the pivots within `tolerance` percent of that price,
+# counted by binary search on the sorted pivot prices. update() takes new bars
+# one at a time and confirms a pivot once `period` bars have followed it.
+class LevelIndex:
+    def __init__(self, tolerance=2.0, period=14):
+        self.tolerance = tolerance
+        self.period = period
+        self.last_price = math.nan
+        self._width = math.log1p(tolerance / 100)
+        self._pivots = {kind: np.empty(0) for kind in KINDS}
+        # kind -> {bucket: [pivots, sum of their prices]}
+        self._buckets = {kind: {} for kind in KINDS}
+        self._window = deque(maxlen=2 * period + 1)
+
+    # Build the index from a history with High, Low and Close columns
+    @classmethod
+    def from_history(cls, data, tolerance=2.0, period=14):
+        lows, highs = data['Low'].to_numpy(), data['High'].to_numpy()
+        support_mask, resistance_mask = pivot_masks(data['Low'], data['High'], period)
+        return cls(tolerance, period)._load(lows, highs, data['Close'].to_numpy(), support_mask, resistance_mask)
+
+    # Fill a new index from one ticker's price arrays and pivot masks
+    def _load(self, lows, highs, closes, support_mask, resistance_mask):
+        self.add_pivots(lows[support_mask], 'support')
+        self.add_pivots(highs[resistance_mask], 'resistance')
+        # The last bars have no full window yet; update() picks them up from here
+        self._window.extend(zip(lows[-2 * self.period:], highs[-2 * self.period:]))
+        if len(closes):
+            self.last_price = float(closes[-1])
+        return self
+
+    # Add pivot prices of one kind ('support' or 'resistance')
+    def add_pivots(self, prices, kind):
+        prices = np.sort(np.asarray(prices, dtype='float64'))
+        prices = prices[np.isfinite(prices) & (prices > 0)]
+        if not len(prices):
+            return
+        pivots = self._pivots[kind]
+        self._pivots[kind] = np.insert(pivots, np.searchsorted(pivots, prices), prices)
+
+        buckets = self._buckets[kind]
+        keys, first, counts = np.unique(np.floor(np.log(prices) / self._width).astype('int64'),
+                                        return_index=True, return_counts=True)
+        sums = np.add.reduceat(prices, first)
+        for key, count, total in zip(keys.tolist(), counts.tolist(), sums.tolist()):
+            bucket = buckets.setdefault(key, [0, 0.0])
+            bucket[0] += count
+            bucket[1] += total
+
+    # Take one new bar (dict, row or anything with Low/High/Close); returns the
+    # pivots it confirmed as (kind, price) pairs
+    def update(self, bar):
+        self._window.append((bar_value(bar, 'Low'), bar_value(bar, 'High')))
+        self.last_price = bar_value(bar, 'Close')
+        if len(self._window) < self._window.maxlen:
+            return []
+        window = np.array(self._window)
+        low, high = window[self.period]
+        confirmed = []
+        with np.errstate(invalid='ignore'):
+            if low == np.nanmin(window[:, 0]):
+                confirmed.append(('support', float(low)))
+            if high == np.nanmax(window[:, 1]):
+                confirmed.append(('resistance', float(high)))
+        for kind, price in confirmed:
+            self.add_pivots([price], kind)
+        return confirmed
+
+    def _sorted_pivots(self, kind=None):
+        if kind is not None:
+            return self._pivots[kind]
+        return np.sort(np.concatenate([self._pivots[kind] for kind in KINDS]))
+
+    # Number of pivots within the tolerance of each price (scalar or array)
+    def touches(self, price, kind=None):
+        pivots = self._sorted_pivots(kind)
+        price = np.asarray(price, dtype='float64')
+        factor = 1 + self.tolerance / 100
+        return (np.searchsorted(pivots, price * factor, side='right')
+                - np.searchsorted(pivots, price / factor, side='left'))
+
+    # Level prices (ascending), kinds, bucket pivot counts and touches as arrays
+    def _level_arrays(self, kind=None):
+        merged = {}
+        for i, level_kind in enumerate(KINDS):
+            if kind is not None and level_kind != kind:
+                continue
+            for key, (count, total) in self._buckets[level_kind].items():
+                entry = merged.setdefault(key, [0, 0, 0.0])
+                entry[i] += count
+                entry[2] += total
+        if not merged:
+            return np.empty(0), np.empty(0, dtype=object), np.empty(0, dtype='int64'), np.empty(0, dtype='int64')
+
+        keys = sorted(merged)
+        support, resistance, total = (np.array(values) for values in zip(*(merged[key] for key in keys)))
+        level = total / (support + resistance)
+        kinds = np.where(resistance == 0, 'support', np.where(support == 0, 'resistance', 'both')).astype(object)
+        return level, kinds, support + resistance, self.touches(level, kind)
+
+    # The same arrays for the k strongest levels: most touches first, then most
+    # pivots in the bucket, then lowest price
+    def _top_arrays(self, k=5, kind=None):
+        level, kinds, pivots, touches = self._level_arrays(kind)
+        order = np.lexsort((level, -pivots, -touches))[:k]
+        return level[order], kinds[order], pivots[order], touches[order]
+
+    # Every level, lowest first: its price, kind ('support', 'resistance' or
+    # 'both'), the pivots in its bucket and its touches
+    def levels(self, kind=None):
+        return pd.DataFrame(dict(zip(LEVEL_COLUMNS, self._level_arrays(kind))))
+
+    # The k strongest levels, strongest first
+    def top(self, k=5, kind=None):
+        return pd.DataFrame(dict(zip(LEVEL_COLUMNS, self._top_arrays(k, kind))))
+
+    # Price of the strongest level, or None without pivots
+    def strongest(self, kind=None):
+        level = self._top_arrays(1, kind)[0]
+        return float(level[0]) if len(level) else None
+
+    # The strong level (among the top k) closest to price, as (level, distance in %)
+    def nearest(self, price, k=5, kind=None):
+        levels = np.sort(self._top_arrays(k, kind)[0])
+        if not len(levels):
+            return None, math.nan
+        pos = np.searchsorted(levels, price)
+        candidates = levels[max(pos - 1, 0):pos + 1]
+        level = candidates[np.argmin(np.abs(np.log(candidates / price)))]
+        return float(level), (price / level - 1) * 100
+
+
+# Level indexes of a whole universe. near() answers "which tickers are within
+# x% of one of their strong levels" with a single binary search over the
+# strong levels of every ticker, keyed by (ticker, log price).
+class UniverseLevels:
+    def __init__(self, tolerance=2.0, period=14, k=5, kind=None):
+        self.tolerance = tolerance
+        self.period = period
+        self.k = k
+        self.kind = kind
+        self.indexes = {}
+        self._strong = None
+
+    def add(self, ticker, data):
+        self.indexes[ticker] = LevelIndex.from_history(data, self.tolerance, self.period)
+        self._strong = None
+
+    # Build the indexes of every ticker of a (field, ticker) column panel, finding
+    # all their pivots in one pass
+    @classmethod
+    def from_panel(cls, panel, tolerance=2.0, period=14, k=5, kind=None):
+        universe = cls(tolerance, period, k, kind)
+        tickers = list(panel['Low'].columns)
+        # Blocks of tickers keep the rolling windows' temporaries bounded
+        block = max(1, PANEL_CHUNK_CELLS // max(len(panel), 1))
+        for first in range(0, len(tickers), block):
+            columns = tickers[first:first + block]
+            lows, highs = panel['Low'][columns], panel['High'][columns]
+            support_mask, resistance_mask = pivot_masks(lows, highs, period)
+            low_values, high_values = lows.to_numpy(), highs.to_numpy()
+            close_values = panel['Close'][columns].to_numpy()
+            for j, ticker in enumerate(columns):
+                universe.indexes[ticker] = LevelIndex(tolerance, period)._load(
+                    low_values[:, j], high_values[:, j], close_values[:, j],
+                    support_mask[:, j], resistance_mask[:, j])
+        return universe
+
+    def update(self, ticker, bar):
+        confirmed = self.indexes[ticker].update(bar)
+        if confirmed:
+            self._strong = None
+        return confirmed
+
+    # Every ticker's top-k levels sorted by (ticker, log price) search key,
+    # rebuilt only after pivots change
+    def _strong_levels(self):
+        if self._strong is None:
+            tickers = list(self.indexes)
+            tops = [self.indexes[ticker]._top_arrays(self.k, self.kind) for ticker in tickers]
+            ids = np.repeat(np.arange(len(tickers)), [len(top[0]) for top in tops])
+            level, kinds, _, touches = (np.concatenate([top[i] for top in tops]) if tops else np.empty(0)
+                                        for i in range(4))
+            keys = ids * _KEY_SPAN + np.log(level.astype('float64')) + _KEY_OFFSET
+            order = np.argsort(keys, kind='stable')
+            self._strong = tickers, keys[order], ids[order], level[order], kinds[order], touches[order]
+        return self._strong
+
+    # Tickers whose price (default: their last close) is within `within` percent
+    # of one of their strong levels, closest first
+    def near(self, within=1.0, prices=None):
+        tickers, keys, level_ids, levels, kinds, touches = self._strong_levels()
+        ids = {ticker: i for i, ticker in enumerate(tickers)}
+        if prices is None:
+            prices = {ticker: index.last_price for ticker, index in self.indexes.items()}
+        prices = pd.Series(prices, dtype='float64').dropna()
+        prices = prices[prices.index.isin(tickers) & (prices > 0)]
+        columns = ['Ticker', 'Price', 'Level', 'Kind', 'Touches', 'Distance %']
+        if not len(prices) or not len(keys):
+            return pd.DataFrame(columns=columns)
+
+        query_ids = prices.index.map(ids).to_numpy()
+        query = query_ids * _KEY_SPAN + np.log(prices.to_numpy()) + _KEY_OFFSET
+
+        # Closest key on either side, as long as it belongs to the same ticker
+        pos = np.searchsorted(keys, query)
+        left, right = np.clip(pos - 1, 0, len(keys) - 1), np.clip(pos, 0, len(keys) - 1)
+        left_gap = np.where(level_ids[left] == query_ids, np.abs(query - keys[left]), np.inf)
+        right_gap = np.where(level_ids[right] == query_ids, np.abs(query - keys[right]), np.inf)
+        best = np.where(left_gap <= right_gap, left, right)
+        gap = np.minimum(left_gap, right_gap)
+
+        hit = gap <= math.log1p(within / 100)
+        best = best[hit]
+        price = prices.to_numpy()[hit]
+        result = pd.DataFrame({
+            'Ticker': prices.index[hit],
+            'Price': price,
+            'Level': levels[best].astype('float64'),
+            'Kind': kinds[best],
+            'Touches': touches[best],
+            'Distance %': (price / levels[best].astype('float64') - 1) * 100,
+        }, columns=columns)
+        return result.sort_values('Distance %', key=np.abs, ignore_index=True)
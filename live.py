@@ -0,0 +1,252 @@
+import copy
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data_store import get_store, normalize_frame
+from instrumentation import count, stage
+from levels import LevelIndex
+from streaming import StreamingEMA, StreamingWilliamsR, StreamingCandlePatterns
+
+# Live mode: instead of rerunning a whole app, poll the data source and append
+# the new bars. Indicators and signals are updated bar by bar with the streaming
+# classes, and only a fixed tail of bars is kept and drawn, so the work and the
+# data sent per update do not grow with the length of the history.
+
+# Bars kept and drawn (a trading session of minute bars)
+LIVE_WINDOW = 390
+
+# History loaded once, when live mode starts, to warm the indicators up
+LIVE_LOOKBACK = {
+    '1m': timedelta(days=5),
+    '5m': timedelta(days=10),
+    '15m': timedelta(days=30),
+    '1h': timedelta(days=90),
+    '1d': timedelta(days=2 * 365),
+}
+
+LIVE_INTERVALS = list(LIVE_LOOKBACK)
+
+# Seconds between polls offered in the sidebar
+REFRESH_CHOICES = [5, 15, 30, 60]
+
+ROW_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'EMA1', 'EMA2', 'Williams %R']
+MARKER_COLUMNS = ['Date', 'Signal', 'Price']
+
+
+# What one poll changed: the bars committed since the last poll, the bar still
+# forming, the signals the committed bars fired and how long it took
+class LiveUpdate:
+    def __init__(self, bars, pending, markers, seconds):
+        self.bars = bars
+        self.pending = pending
+        self.markers = markers
+        self.seconds = seconds
+
+
+# The live tail of one ticker. The last bar the source returns is still forming:
+# it is shown (with indicator values from a copy of the indicator state) but only
+# committed once a newer bar arrives. Signals match the apps':
+#   EMA Buy/Sell           EMA1 crosses above/below EMA2 (signals.py)
+#   Williams %R Buy/Sell   %R crosses above -80 at support / below -20 at
+#                          resistance (williamR.py), with levels from a LevelIndex
+#   candle patterns        'Bullish After Bearish' and 'Bearish Engulfing'
+class LiveFeed:
+    def __init__(self, ticker, interval='1m', window=LIVE_WINDOW, ema1_period=12, ema2_period=26,
+                 wr_period=14, provider=None):
+        self.ticker = ticker
+        self.interval = interval
+        self.provider = provider or get_store().provider
+        self.rows = deque(maxlen=window)
+        self.markers = deque(maxlen=window)
+        self.pending = None
+        self.last_time = None
+        self.polls = 0
+        self._ema1 = StreamingEMA(ema1_period)
+        self._ema2 = StreamingEMA(ema2_period)
+        self._wr = StreamingWilliamsR(wr_period)
+        self._patterns = StreamingCandlePatterns()
+        self._levels = LevelIndex(period=wr_period)
+        self._above = None
+
+    # Indicator values of a bar, advancing the given indicators
+    def _indicators(self, ema1, ema2, wr, bar):
+        return {'EMA1': ema1.update(bar), 'EMA2': ema2.update(bar), 'Williams %R': wr.update(bar)}
+
+    # Add one finished bar; returns the markers it fired
+    def _commit(self, date, bar):
+        prev_wr = self._wr.value
+        row = dict(bar, **self._indicators(self._ema1, self._ema2, self._wr, bar))
+        fired = []
+        patterns = self._patterns.update(bar)
+        wr = row['Williams %R']
+        # Levels as of the previous bar, only looked up when %R crosses
+        if prev_wr < -80 < wr:
+            support = self._levels.strongest('support')
+            if support is not None and bar['Low'] <= support:
+                fired.append(('Williams %R Buy', bar['Close']))
+        if prev_wr > -20 > wr:
+            resistance = self._levels.strongest('resistance')
+            if resistance is not None and bar['High'] >= resistance:
+                fired.append(('Williams %R Sell', bar['Close']))
+        self._levels.update(bar)
+
+        fired += [(name, bar['Low'] if name == 'Bullish After Bearish' else bar['High'])
+                  for name, flag in patterns.items() if flag]
+        above = row['EMA1'] > row['EMA2']
+        if self._above is not None and above != self._above:
+            fired.append(('EMA Buy' if above else 'EMA Sell', bar['Close']))
+        self._above = above
+
+        self.rows.append((date, row))
+        markers = [(date, name, price) for name, price in fired]
+        self.markers.extend(markers)
+        return markers
+
+    # Take the bars fetched since the last poll: all but the newest are committed
+    def _take(self, data):
+        if self.last_time is not None:
+            data = data[data.index >= self.last_time]
+        if not len(data):
+            return [], []
+        committed, markers = [], []
+        for date, bar in zip(data.index[:-1], data[ROW_COLUMNS[:5]].to_dict('records')):
+            markers += self._commit(date, bar)
+            committed.append(date)
+
+        date, bar = data.index[-1], data[ROW_COLUMNS[:5]].iloc[-1].to_dict()
+        indicators = self._indicators(copy.deepcopy(self._ema1), copy.deepcopy(self._ema2),
+                                      copy.deepcopy(self._wr), bar)
+        self.pending = (date, dict(bar, **indicators))
+        self.last_time = date
+        return committed, markers
+
+    def _fetch(self, start, end):
+        with stage('live fetch'):
+            data = normalize_frame(self.provider.fetch(self.ticker, start, end, self.interval))
+        count('live bars', len(data))
+        return data
+
+    # Load the lookback history once and run it through the indicators
+    def start(self, now=None, lookback=None):
+        now = pd.Timestamp(now or datetime.now())
+        lookback = lookback or LIVE_LOOKBACK.get(self.interval, timedelta(days=5))
+        started = time.perf_counter()
+        committed, markers = self._take(self._fetch(now - lookback, now + timedelta(minutes=1)))
+        return LiveUpdate(committed, self.pending, markers, time.perf_counter() - started)
+
+    # Fetch from the forming bar on and append what is new
+    def poll(self, now=None):
+        if self.last_time is None:
+            return self.start(now)
+        now = pd.Timestamp(now or datetime.now())
+        started = time.perf_counter()
+        self.polls += 1
+        committed, markers = self._take(self._fetch(self.last_time, now + timedelta(minutes=1)))
+        return LiveUpdate(committed, self.pending, markers, time.perf_counter() - started)
+
+    # The kept bars, forming bar last, as a frame
+    def frame(self):
+        rows = list(self.rows) + ([self.pending] if self.pending is not None else [])
+        if not rows:
+            return pd.DataFrame(columns=ROW_COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype='float64')
+        dates, values = zip(*rows)
+        return pd.DataFrame(list(values), index=pd.DatetimeIndex(dates, name='Date'), columns=ROW_COLUMNS)
+
+    # The kept markers that fall inside the kept bars
+    def marker_frame(self):
+        markers = pd.DataFrame(list(self.markers), columns=MARKER_COLUMNS)
+        if self.rows:
+            markers = markers[markers['Date'] >= self.rows[0][0]]
+        return markers
+
+
+# Function to draw the live tail: candles, the EMAs, the signal markers and,
+# optionally, Williams %R below. uirevision keeps the user's zoom across updates.
+def live_figure(feed, title, ema=True, williams_r=True):
+    from plotly.subplots import make_subplots
+
+    from charts import add_candles, add_level, add_line, add_markers
+
+    data = feed.frame()
+    fig = make_subplots(rows=2 if williams_r else 1, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        row_heights=[0.7, 0.3] if williams_r else None)
+    add_candles(fig, data, name=feed.ticker, row=1, col=1)
+    if ema:
+        add_line(fig, data['EMA1'], 'EMA1', line=dict(color='blue'), row=1, col=1)
+        add_line(fig, data['EMA2'], 'EMA2', line=dict(color='red'), row=1, col=1)
+    if williams_r:
+        add_line(fig, data['Williams %R'], 'Williams %R', line=dict(color='blue', width=2), row=2, col=1)
+        add_level(fig, -20, 'Overbought', color='purple', row=2, col=1)
+        add_level(fig, -80, 'Oversold', color='purple', row=2, col=1)
+
+    markers = feed.marker_frame()
+    styles = {'Buy': ('green', 'triangle-up'), 'Sell': ('red', 'triangle-down'),
+              'Bullish After Bearish': ('green', 'triangle-up'), 'Bearish Engulfing': ('red', 'triangle-down')}
+    for name, group in markers.groupby('Signal'):
+        if not ema and name.startswith('EMA') or not williams_r and name.startswith('Williams'):
+            continue
+        color, symbol = styles.get(name.split()[-1], styles.get(name))
+        add_markers(fig, group['Date'], group['Price'], name, color=color, symbol=symbol, row=1, col=1)
+
+    fig.update_layout(title=title, xaxis_rangeslider_visible=False, height=700 if williams_r else 500,
+                      uirevision=f'{feed.ticker}:{feed.interval}')
+    return fig
+
+
+# Function to get Streamlit's fragment decorator (st.fragment, or
+# st.experimental_fragment on older versions)
+def fragment(run_every=None):
+    import streamlit as st
+
+    decorator = getattr(st, 'fragment', None) or st.experimental_fragment
+    return decorator(run_every=run_every)
+
+
+# Function to add the live mode switches to the sidebar; returns
+# (on, interval, refresh seconds)
+def live_controls(default_interval='1m'):
+    import streamlit as st
+
+    on = st.sidebar.toggle('Live mode', value=False)
+    if not on:
+        return False, None, None
+    interval = st.sidebar.selectbox('Live interval:', LIVE_INTERVALS, index=LIVE_INTERVALS.index(default_interval))
+    seconds = st.sidebar.selectbox('Refresh every:', REFRESH_CHOICES, index=1, format_func=lambda s: f'{s} s')
+    return True, interval, seconds
+
+
+# Function to show a live chart that polls every `seconds` seconds. Only this
+# fragment reruns on each tick; the feed lives in the session state, so every
+# tick fetches and processes just the new bars.
+def live_panel(ticker, interval, seconds, title, ema1_period=12, ema2_period=26, wr_period=14,
+               ema=True, williams_r=True):
+    import streamlit as st
+
+    key = f'live:{ticker}:{interval}:{ema1_period}:{ema2_period}:{wr_period}'
+    # One feed per session; switching ticker or settings starts a new one
+    for old in [name for name in st.session_state if str(name).startswith('live:') and name != key]:
+        del st.session_state[old]
+
+    @fragment(run_every=seconds)
+    def update():
+        feed = st.session_state.get(key)
+        if feed is None:
+            feed = st.session_state[key] = LiveFeed(ticker, interval, ema1_period=ema1_period,
+                                                    ema2_period=ema2_period, wr_period=wr_period)
+        with stage('live update'):
+            change = feed.poll()
+        if feed.pending is None:
+            st.write(f'No {interval} bars for {ticker} yet.')
+            return
+        st.plotly_chart(live_figure(feed, title, ema=ema, williams_r=williams_r))
+        latest = ''
+        if change.markers:
+            date, name, _ = change.markers[-1]
+            latest = f', latest {name} at {date:%Y-%m-%d %H:%M}'
+        st.caption(f'Updated {datetime.now():%H:%M:%S}: {len(change.bars)} new bars, {len(change.markers)} new '
+                   f'signals{latest} ({change.seconds * 1000:.0f} ms). Last bar {feed.pending[0]:%Y-%m-%d %H:%M}.')
+
+    update()
@@ -0,0 +1,138 @@
+import numpy as np
+
+from instrumentation import timed
+
+# One bit per pattern in the uint32 mask returned by pattern_bitmask
+BULLISH_ENGULFING = 1 << 0   # 'Bullish After Bearish' in candlestick.py
+BEARISH_ENGULFING = 1 << 1
+HAMMER = 1 << 2
+SHOOTING_STAR = 1 << 3
+DOJI = 1 << 4
+BULLISH_HARAMI = 1 << 5
+BEARISH_HARAMI = 1 << 6
+PIERCING_LINE = 1 << 7
+DARK_CLOUD_COVER = 1 << 8
+MORNING_STAR = 1 << 9
+EVENING_STAR = 1 << 10
+THREE_WHITE_SOLDIERS = 1 << 11
+THREE_BLACK_CROWS = 1 << 12
+
+PATTERNS = {
+    'engulfing_bull': BULLISH_ENGULFING,
+    'engulfing_bear': BEARISH_ENGULFING,
+    'hammer': HAMMER,
+    'shooting_star': SHOOTING_STAR,
+    'doji': DOJI,
+    'harami_bull': BULLISH_HARAMI,
+    'harami_bear': BEARISH_HARAMI,
+    'piercing_line': PIERCING_LINE,
+    'dark_cloud_cover': DARK_CLOUD_COVER,
+    'morning_star': MORNING_STAR,
+    'evening_star': EVENING_STAR,
+    'three_white_soldiers': THREE_WHITE_SOLDIERS,
+    'three_black_crows': THREE_BLACK_CROWS,
+}
+
+# Values (bars x tickers) handled per block; bounds the temporaries to a few
+# MB each whatever the history length or universe size
+CHUNK_CELLS = 1 << 18
+
+# Candle shape thresholds, as fractions of the bar's high-low range or body
+DOJI_BODY = 0.1          # body at most 10% of the range
+SHADOW_RATIO = 2.0       # hammer/shooting star shadow at least twice the body
+SMALL_SHADOW = 0.1       # the other shadow at most 10% of the range
+STAR_BODY = 0.3          # middle star body at most 30% of the first body
+
+
+# Function to shift rows down by k bars (along time, axis 0), padding with NaN
+def lag(values, k):
+    shifted = np.empty_like(values)
+    shifted[:k] = np.nan
+    shifted[k:] = values[:len(values) - k]
+    return shifted
+
+
+# Function to compute the pattern bits of a block of bars. Each input is a
+# float array of bars (time) or of bars x tickers; missing values never match.
+def _block_bitmask(open_, high, low, close):
+    mask = np.zeros(open_.shape, dtype=np.uint32)
+
+    def flag(condition, bit):
+        mask[condition] |= np.uint32(bit)
+
+    with np.errstate(invalid='ignore'):
+        bullish = close > open_
+        bearish = close < open_
+        body = np.abs(close - open_)
+        candle_range = high - low
+        upper_shadow = high - np.maximum(open_, close)
+        lower_shadow = np.minimum(open_, close) - low
+
+        prev_open, prev_close = lag(open_, 1), lag(close, 1)
+        prev_bullish = prev_close > prev_open
+        prev_bearish = prev_close < prev_open
+        prev_mid = (prev_open + prev_close) / 2
+
+        # Two-bar patterns, the first two exactly as identify_candle_patterns had them
+        flag(bullish & prev_bearish & (prev_close > open_) & (prev_open < close), BULLISH_ENGULFING)
+        flag(bearish & prev_bullish & (prev_close < open_) & (prev_open > close), BEARISH_ENGULFING)
+        flag(bullish & prev_bearish & (open_ > prev_close) & (close < prev_open), BULLISH_HARAMI)
+        flag(bearish & prev_bullish & (open_ < prev_close) & (close > prev_open), BEARISH_HARAMI)
+        flag(bullish & prev_bearish & (open_ < prev_close) & (close > prev_mid) & (close < prev_open),
+             PIERCING_LINE)
+        flag(bearish & prev_bullish & (open_ > prev_close) & (close < prev_mid) & (close > prev_open),
+             DARK_CLOUD_COVER)
+
+        # Single-bar shapes
+        flag((candle_range > 0) & (body <= DOJI_BODY * candle_range), DOJI)
+        flag((candle_range > 0) & (lower_shadow >= SHADOW_RATIO * body)
+             & (upper_shadow <= SMALL_SHADOW * candle_range) & (body > DOJI_BODY * candle_range), HAMMER)
+        flag((candle_range > 0) & (upper_shadow >= SHADOW_RATIO * body)
+             & (lower_shadow <= SMALL_SHADOW * candle_range) & (body > DOJI_BODY * candle_range), SHOOTING_STAR)
+
+        # Three-bar patterns
+        first_open, first_close = lag(open_, 2), lag(close, 2)
+        first_body = np.abs(first_close - first_open)
+        first_mid = (first_open + first_close) / 2
+        small_star = lag(body, 1) <= STAR_BODY * first_body
+        flag((first_close < first_open) & small_star & bullish & (close > first_mid), MORNING_STAR)
+        flag((first_close > first_open) & small_star & bearish & (close < first_mid), EVENING_STAR)
+
+        flag(bullish & prev_bullish & (first_close > first_open) & (close > prev_close) & (prev_close > first_close)
+             & (open_ > prev_open) & (open_ < prev_close) & (prev_open > first_open) & (prev_open < first_close),
+             THREE_WHITE_SOLDIERS)
+        flag(bearish & prev_bearish & (first_close < first_open) & (close < prev_close) & (prev_close < first_close)
+             & (open_ < prev_open) & (open_ > prev_close) & (prev_open < first_open) & (prev_open > first_close),
+             THREE_BLACK_CROWS)
+    return mask
+
+
+# Function to find every pattern of the library on every bar in one pass over
+# raw OHLC arrays (1-D per ticker, or 2-D bars x tickers). Returns a uint32
+# bitmask per bar; long histories are processed in blocks of about CHUNK_CELLS
+# values (plus the two bars of look-back the three-bar patterns need).
+@timed
+def pattern_bitmask(open_, high, low, close, chunk_rows=None):
+    # Converted to float64 a block at a time, so float32 inputs are never copied whole
+    open_, high, low, close = (np.asarray(values) for values in (open_, high, low, close))
+    mask = np.empty(open_.shape, dtype=np.uint32)
+    if chunk_rows is None:
+        tickers = open_.shape[1] if open_.ndim == 2 else 1
+        chunk_rows = max(CHUNK_CELLS // tickers, 16)
+    for start in range(0, len(open_), chunk_rows):
+        lookback = min(start, 2)
+        block = slice(start - lookback, start + chunk_rows)
+        mask[start:start + chunk_rows] = _block_bitmask(
+            *(np.asarray(values[block], dtype='float64') for values in (open_, high, low, close)))[lookback:]
+    return mask
+
+
+# Function to get a boolean array of the bars showing a pattern (bit or name)
+def has_pattern(mask, pattern):
+    bit = PATTERNS[pattern] if isinstance(pattern, str) else pattern
+    return (mask & np.uint32(bit)) != 0
+
+
+# Function to list the names of the patterns set in one bar's mask
+def pattern_names(bits):
+    return [name for name, bit in PATTERNS.items() if int(bits) & bit]
@@ -0,0 +1,106 @@
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from datetime import datetime, timedelta
+from series import load_series, MAX_LOOKBACK
+from data_store import get_store
+from backtest import run_backtest, band_signals, williams_r_signals, ema_signals
+from rules import compile_rules, RuleError
+from charts import add_line
+from universe import get_top_stocks, top_stocks
+from result_cache import cached
+from instrumentation import start_run, stage, sidebar_report
+
+# Function to build the (field, ticker) panel of the universe from the shared
+# series; tickers that fail to load are returned separately
+@cached
+def load_panel(tickers, start_date):
+    # Download the whole universe concurrently before slicing each ticker
+    errors = get_store().refresh_many(tickers, (datetime.now() - MAX_LOOKBACK).date(), datetime.now())
+    frames, failed = {}, []
+    for ticker in dict.fromkeys(tickers):
+        if ticker in errors:
+            failed.append(ticker)
+            continue
+        try:
+            window = load_series(ticker).window(start_date)
+        except Exception:
+            window = None
+        if window is None or window.empty:
+            failed.append(ticker)
+        else:
+            frames[ticker] = window[['Open', 'High', 'Low', 'Close', 'Volume']]
+    if not frames:
+        return None, failed
+    return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1), failed
+
+def main():
+    # Title for the Streamlit app
+    st.title("Portfolio Backtest")
+
+    # Universe to backtest
+    universe_name = st.sidebar.selectbox("Select Universe:", ["Candlestick Top 50", "Support/Resistance Top 50"])
+    tickers = list(get_top_stocks().values()) if universe_name == "Candlestick Top 50" else top_stocks
+
+    # Dropdown for selecting time period
+    time_period = st.sidebar.selectbox("Select Time Period:", ["5 Years", "3 Years", "1 Year", "6 Months"])
+    days = {"5 Years": 5 * 365, "3 Years": 3 * 365, "1 Year": 365, "6 Months": 6 * 30}[time_period]
+    start_date = (datetime.now() - timedelta(days=days)).date()
+
+    with stage('load data'):
+        panel, failed = load_panel(tuple(tickers), start_date)
+    if failed:
+        st.write(f"No data for: {', '.join(failed)}")
+    if panel is None:
+        return
+
+    # Signal rule and its parameters
+    rule = st.sidebar.radio("Signals:", ["Support/Resistance Bands", "Williams %R", "EMA Crossover", "Custom Rule"])
+    if rule == "Support/Resistance Bands":
+        percentage = st.sidebar.slider("Threshold Percentage (%)", 1, 20, 2)
+        buy, sell = band_signals(panel['Close'], percentage)
+    elif rule == "Williams %R":
+        period = st.sidebar.slider("Williams %R Period:", min_value=2, max_value=50, value=14)
+        buy, sell = williams_r_signals(panel, period)
+    elif rule == "EMA Crossover":
+        ema1_period = st.sidebar.slider("EMA1 Length:", min_value=1, max_value=200, value=12)
+        ema2_period = st.sidebar.slider("EMA2 Length:", min_value=1, max_value=200, value=26)
+        buy, sell = ema_signals(panel['Close'], ema1_period, ema2_period)
+    else:
+        # Both rules are compiled into one plan, so shared parts run once (see rules.py)
+        buy_rule = st.sidebar.text_input("Buy Rule:", "wr(14) crosses above -80 and close > ema(50)")
+        sell_rule = st.sidebar.text_input("Sell Rule:", "wr(14) crosses below -20")
+        try:
+            with stage('rules'):
+                signals = compile_rules({'Buy': buy_rule, 'Sell': sell_rule}).evaluate(panel)
+        except RuleError as e:
+            st.error(f"Invalid rule: {e}")
+            return
+        buy, sell = signals['Buy'], signals['Sell']
+
+    result = run_backtest(panel['Close'], buy, sell)
+
+    # Portfolio figures
+    columns = st.columns(4)
+    columns[0].metric("Portfolio ROI", f"{result.portfolio['ROI %']:.2f}%")
+    columns[1].metric("PnL", f"${result.portfolio['PnL']:,.0f}")
+    columns[2].metric("Max Drawdown", f"${result.portfolio['Max Drawdown']:,.0f}")
+    columns[3].metric("Trades", f"{result.portfolio['Buys']} buys / {result.portfolio['Sells']} sells")
+
+    # Mark-to-market PnL of the whole portfolio
+    fig = go.Figure()
+    add_line(fig, result.pnl.sum(axis=1), 'Portfolio PnL')
+    fig.update_layout(title='Portfolio PnL ($)', xaxis_title='Date', yaxis_title='PnL')
+    with stage('render chart'):
+        st.plotly_chart(fig)
+
+    # Per-ticker results and the trade list
+    st.write("Per-ticker results:")
+    st.dataframe(result.summary.sort_values('ROI %', ascending=False))
+    st.write("Trades:")
+    st.dataframe(result.trades, hide_index=True)
+
+if __name__ == "__main__":
+    start_run('portfolio')
+    main()
+    sidebar_report()
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from data_store import normalize_frame
+
+
+# Function to build a chart API (v8) response body holding the bars of a frame
+# whose (naive) timestamps are local to the exchange's timezone
+def chart_payload(ticker, data, timezone='UTC'):
+    data = normalize_frame(data)
+    index = data.index.tz_localize(timezone, ambiguous=True, nonexistent='shift_forward')
+    timestamps = (index.tz_convert('UTC').tz_localize(None).values.astype('datetime64[s]').astype('int64')).tolist()
+
+    def column(name):
+        return [None if np.isnan(value) else float(value) for value in data[name].to_numpy()]
+
+    return {'chart': {'result': [{
+        'meta': {'symbol': ticker, 'exchangeTimezoneName': timezone},
+        'timestamp': timestamps,
+        'indicators': {
+            'quote': [{name.lower(): column(name) for name in ('Open', 'High', 'Low', 'Close', 'Volume')}],
+            'adjclose': [{'adjclose': column('Adj Close')}],
+        },
+    }], 'error': None}}
+
+
+# Local stand-in for the chart API, so fetchers can be exercised offline.
+#
+# `frames` maps tickers to OHLCV frames answered for whatever period1/period2
+# is asked. `responses` maps tickers to canned (status, body[, headers]) replies
+# given in order, the last one repeating (e.g. a 429 then a 200 to test
+# retries). Unknown tickers get the API's 404. Frames are in the exchange
+# `timezone`, which the replies name like the real API does. Every request is
+# logged.
+class ReplayServer:
+    def __init__(self, frames=None, responses=None, delay=0.0, host='127.0.0.1', port=0, timezone='UTC'):
+        self.frames = dict(frames or {})
+        self.timezone = timezone
+        self.responses = {ticker: list(replies) for ticker, replies in (responses or {}).items()}
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    # Server answering with the <ticker>.csv files (as frames) and <ticker>.json
+    # files (as a single canned 200 reply) of a directory
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        frames, responses = {}, {}
+        for name in os.listdir(directory):
+            ticker, extension = os.path.splitext(name)
+            path = os.path.join(directory, name)
+            if extension == '.csv':
+                frames[ticker] = pd.read_csv(path, index_col=0, parse_dates=True)
+            elif extension == '.json':
+                with open(path) as f:
+                    responses[ticker] = [(200, json.load(f))]
+        return cls(frames, responses, **kwargs)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v8/finance/chart'
+
+    def _reply(self, ticker, query):
+        with self._lock:
+            self.requests.append((ticker, query))
+            replies = self.responses.get(ticker)
+            if replies:
+                return replies.pop(0) if len(replies) > 1 else replies[0]
+        if ticker in self.frames:
+            data = normalize_frame(self.frames[ticker])
+            start, end = (pd.Timestamp(int(query.get(name, default)), unit='s', tz='UTC')
+                          .tz_convert(self.timezone).tz_localize(None)
+                          for name, default in (('period1', 0), ('period2', 2 ** 32)))
+            return 200, chart_payload(ticker, data[(data.index >= start) & (data.index < end)], self.timezone)
+        return 404, {'chart': {'result': None, 'error': {
+            'code': 'Not Found', 'description': 'No data found, symbol may be delisted'}}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                ticker = url.path.rstrip('/').rsplit('/', 1)[-1]
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                reply = server._reply(ticker, query)
+                status, body = reply[:2]
+                headers = reply[2] if len(reply) > 2 else {}
+                if server.delay:
+                    threading.Event().wait(server.delay)
+                content = (body if isinstance(body, str) else json.dumps(body)).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                for key, value in headers.items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,209 @@
+import functools
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as clock, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count
+
+# US equity regular session, which is when new bars show up
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = clock(9, 30)
+MARKET_CLOSE = clock(16, 0)
+
+
+# Function to work out how long a result may be served from cache: a short TTL
+# while the market is open, otherwise until the next session opens (weekends
+# are skipped, exchange holidays are not)
+def market_ttl(now=None, intraday_ttl=60):
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE:
+        close = datetime.combine(now.date(), MARKET_CLOSE, MARKET_TZ)
+        # Let the last bar of the day through as soon as the session ends
+        return max(1.0, min(intraday_ttl, (close - now).total_seconds()))
+
+    next_open = datetime.combine(now.date(), MARKET_OPEN, MARKET_TZ)
+    if now.time() >= MARKET_OPEN:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return (next_open - now).total_seconds()
+
+
+# Function to reduce an argument to something hashable that changes whenever
+# its contents do. DataFrames and arrays are hashed by value, so the same prices
+# give the same key no matter which session loaded them.
+def fingerprint(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes(),
+                                 digest_size=16)
+        columns = tuple(value.columns) if isinstance(value, pd.DataFrame) else value.name
+        return (type(value).__name__, value.shape, columns, digest.hexdigest())
+    if isinstance(value, pd.Index):
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(pd.Series(value), index=False).to_numpy().tobytes(),
+                                 digest_size=16)
+        return (type(value).__name__, len(value), str(value.dtype), value.name, digest.hexdigest())
+    if isinstance(value, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16)
+        return ('ndarray', value.shape, str(value.dtype), digest.hexdigest())
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(fingerprint(item) for item in value)
+    if isinstance(value, dict):
+        return ('dict',) + tuple((key, fingerprint(item)) for key, item in sorted(value.items()))
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    try:
+        hash(value)
+    except TypeError:
+        # A repr may be truncated or shared by different values, so it is no key
+        raise TypeError(f'Cannot build a cache key from a {type(value).__name__} argument') from None
+    return value
+
+
+# Function to estimate how many bytes a cached value keeps alive
+def sizeof(value, _seen=None):
+    _seen = _seen if _seen is not None else set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(key, _seen) + sizeof(item, _seen) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(item, _seen) for item in value)
+    if hasattr(value, 'to_plotly_json'):
+        # Plotly figures: count the trace and layout data they hold
+        return sizeof(value.to_plotly_json(), _seen)
+    return sys.getsizeof(value)
+
+
+# Process-wide memo table shared by every session of every app.
+#
+# Entries expire by TTL and the least recently used ones are evicted once the
+# total estimated size passes max_bytes. Concurrent callers asking for the same
+# key wait for the first one instead of computing it again.
+class ResultCache:
+    def __init__(self, max_bytes=512 * 1024 ** 2, ttl=market_ttl):
+        self.max_bytes = max_bytes
+        # Seconds, or a callable returning seconds for a new entry
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, expires = entry
+        if now >= expires:
+            del self._entries[key]
+            self.bytes -= size
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, ttl):
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        expires = time.monotonic() + (ttl() if callable(ttl) else ttl)
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size, expires)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    # Return the cached value for key, computing (once) and storing it on a miss
+    def get_or_compute(self, key, compute, ttl=None):
+        while True:
+            with self._lock:
+                entry = self._lookup(key, time.monotonic())
+                if entry is not None:
+                    self.hits += 1
+                    count('cache hits')
+                    return entry[0]
+                waiting = self._in_flight.get(key)
+                if waiting is None:
+                    self.misses += 1
+                    count('cache misses')
+                    done = self._in_flight[key] = threading.Event()
+                    break
+            # Someone else is computing it; take their result (or retry if they failed)
+            waiting.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                self._store(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+_default_cache = ResultCache()
+
+
+# Function to get the cache shared by every app in this process
+def get_cache():
+    return _default_cache
+
+
+# Decorator memoizing a function in the shared cache, keyed on the function and
+# the fingerprint of its arguments (ticker, dates, data, parameters, ...)
+def cached(func=None, *, ttl=None, cache=None):
+    if func is None:
+        return functools.partial(cached, ttl=ttl, cache=cache)
+
+    # Streamlit runs every app as __main__, so the file keeps their functions apart
+    name = f'{func.__module__}.{func.__qualname__}@{func.__code__.co_filename}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (name, fingerprint(args), fingerprint(kwargs))
+        return (cache or _default_cache).get_or_compute(key, lambda: func(*args, **kwargs), ttl)
+
+    return wrapper
@@ -0,0 +1,410 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from indicators import identify_support_resistance_levels
+from instrumentation import count, timed
+from patterns import PATTERNS, pattern_bitmask
+
+# A small language for signal rules, e.g.
+#
+#   ema(12) crosses above ema(26) and wr(14) < -80 and pattern(engulfing_bull)
+#
+# Expressions combine numbers, the fields open/high/low/close/volume and the
+# functions in FUNCTIONS with + - * /, comparisons (< <= > >= == !=),
+# `a crosses [above|below] b`, and/or/not and parentheses. compile_rules turns
+# any number of rules into one Plan: every sub-expression (a rolling max, a
+# shift, an EMA, a comparison) becomes one step, and steps that appear in
+# several places or several rules are computed once. A plan runs vectorized
+# over one ticker (OHLC columns) or a whole (field, ticker) column panel.
+
+FIELDS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+# Function name -> (minimum, maximum) number of arguments
+FUNCTIONS = {
+    'ema': (1, 2),          # ema(span[, x=close])
+    'sma': (1, 2),          # sma(n[, x=close])
+    'highest': (1, 2),      # highest(n[, x=high]), rolling max
+    'lowest': (1, 2),       # lowest(n[, x=low]), rolling min
+    'wr': (0, 1),           # wr([n=14]), Williams %R
+    'shift': (1, 2),        # shift(x[, k=1]), the value k bars earlier
+    'prev': (1, 2),         # same as shift
+    'pattern': (1, 1),      # pattern(name), a candle pattern of patterns.PATTERNS
+    'support': (0, 1),      # support([n=14]), most touched pivot low
+    'resistance': (0, 1),   # resistance([n=14]), most touched pivot high
+    'within': (3, 3),       # within(x, level, pct), x within pct % of level
+}
+
+KEYWORDS = {'and', 'or', 'not', 'crosses', 'above', 'below'}
+
+# Comparison -> the same comparison with its operands swapped
+MIRRORED = {'lt': 'gt', 'le': 'ge', 'gt': 'lt', 'ge': 'le', 'eq': 'eq', 'ne': 'ne'}
+COMPARISONS = {'<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge', '==': 'eq', '!=': 'ne'}
+ARITHMETIC = {'+': 'add', '-': 'sub', '*': 'mul', '/': 'div'}
+COMMUTATIVE = {'add', 'mul', 'and', 'or', 'eq', 'ne'}
+
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(<=|>=|==|!=|[-+*/<>(),]))')
+
+
+class RuleError(ValueError):
+    pass
+
+
+# Function to split a rule into (kind, value, position) tokens
+def tokenize(text):
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise RuleError(f'Unexpected character {text[pos:].strip()[0]!r} at position {pos}')
+        number, name, symbol = match.groups()
+        if number is not None:
+            tokens.append(('number', float(number), match.start(1)))
+        elif name is not None:
+            name = name.lower()
+            tokens.append(('keyword' if name in KEYWORDS else 'name', name, match.start(2)))
+        else:
+            tokens.append(('symbol', symbol, match.start(3)))
+        pos = match.end()
+    tokens.append(('end', None, len(text)))
+    return tokens
+
+
+# Recursive descent parser producing nested tuples:
+# ('number', v), ('name', n), ('call', n, args), ('op', op, a, b), ('not', a),
+# ('neg', a) and ('crosses', direction, a, b)
+class _Parser:
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self, kind=None, value=None):
+        token = self.tokens[self.pos]
+        if (kind is None or token[0] == kind) and (value is None or token[1] == value):
+            return token
+        return None
+
+    def take(self, kind=None, value=None):
+        token = self.peek(kind, value)
+        if token is not None:
+            self.pos += 1
+        return token
+
+    def expect(self, kind, value=None):
+        token = self.take(kind, value)
+        if token is None:
+            found = self.tokens[self.pos]
+            what = 'end of rule' if found[0] == 'end' else repr(found[1])
+            raise RuleError(f'Expected {value or kind} at position {found[2]}, found {what}')
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        self.expect('end')
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.take('keyword', 'or'):
+            node = ('op', 'or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.take('keyword', 'and'):
+            node = ('op', 'and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.take('keyword', 'not'):
+            return ('not', self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        node = self.parse_sum()
+        if self.take('keyword', 'crosses'):
+            direction = 'any'
+            for candidate in ('above', 'below'):
+                if self.take('keyword', candidate):
+                    direction = candidate
+            return ('crosses', direction, node, self.parse_sum())
+        token = self.peek('symbol')
+        if token is not None and token[1] in COMPARISONS:
+            self.pos += 1
+            return ('op', COMPARISONS[token[1]], node, self.parse_sum())
+        return node
+
+    def parse_sum(self):
+        node = self.parse_product()
+        while self.peek('symbol') and self.peek()[1] in '+-':
+            node = ('op', ARITHMETIC[self.take()[1]], node, self.parse_product())
+        return node
+
+    def parse_product(self):
+        node = self.parse_unary()
+        while self.peek('symbol') and self.peek()[1] in '*/':
+            node = ('op', ARITHMETIC[self.take()[1]], node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.take('symbol', '-'):
+            return ('neg', self.parse_unary())
+        if self.take('symbol', '+'):
+            return self.parse_unary()
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.take('number')
+        if token is not None:
+            return ('number', token[1])
+        if self.take('symbol', '('):
+            node = self.parse_or()
+            self.expect('symbol', ')')
+            return node
+        token = self.expect('name')
+        if not self.take('symbol', '('):
+            return ('name', token[1])
+        args = []
+        if not self.take('symbol', ')'):
+            args.append(self.parse_or())
+            while self.take('symbol', ','):
+                args.append(self.parse_or())
+            self.expect('symbol', ')')
+        return ('call', token[1], args)
+
+
+# Function to parse one rule into its syntax tree
+def parse_rule(text):
+    return _Parser(text).parse()
+
+
+def _fold(op, a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float({'add': np.add, 'sub': np.subtract, 'mul': np.multiply, 'div': np.divide}[op](a, b))
+
+
+# An ordered list of unique steps; step i only uses the results of steps before it
+class Plan:
+    def __init__(self):
+        self.steps = []       # (op, params, input step numbers)
+        self.outputs = {}     # rule name -> step number
+        self._keys = {}
+
+    def __len__(self):
+        return len(self.steps)
+
+    # Function to add a step, or find the identical one already planned
+    def _step(self, op, params=(), inputs=()):
+        if op in COMMUTATIVE:
+            inputs = tuple(sorted(inputs))
+        key = (op, params, tuple(inputs))
+        if key not in self._keys:
+            self._keys[key] = len(self.steps)
+            self.steps.append(key)
+        return self._keys[key]
+
+    def _constant(self, step):
+        op, params, _ = self.steps[step]
+        return params[0] if op == 'const' else None
+
+    def _binary(self, op, a, b):
+        if op in MIRRORED and MIRRORED[op] != op and a > b:
+            # a > b and b < a are the same step
+            op, a, b = MIRRORED[op], b, a
+        x, y = self._constant(a), self._constant(b)
+        if op in ('add', 'sub', 'mul', 'div') and x is not None and y is not None:
+            return self._step('const', (_fold(op, x, y),))
+        return self._step(op, (), (a, b))
+
+    def _integer(self, step, name, minimum=1):
+        value = self._constant(step)
+        if value is None or value != int(value) or value < minimum:
+            raise RuleError(f'{name}() needs a whole number of at least {minimum} here')
+        return int(value)
+
+    # Function to plan a syntax tree; returns the step number of its result
+    def add(self, node):
+        kind = node[0]
+        if kind == 'number':
+            return self._step('const', (node[1],))
+        if kind == 'name':
+            if node[1] not in FIELDS:
+                raise RuleError(f'Unknown field {node[1]!r}; use one of {", ".join(FIELDS)}')
+            return self._step('field', (FIELDS[node[1]],))
+        if kind == 'neg':
+            return self._binary('mul', self._step('const', (-1.0,)), self.add(node[1]))
+        if kind == 'not':
+            return self._step('not', (), (self.add(node[1]),))
+        if kind == 'op':
+            return self._binary(node[1], self.add(node[2]), self.add(node[3]))
+        if kind == 'crosses':
+            # Like the Position column of signals.generate_signals: the change of
+            # the a > b state (1, 0, or NaN while either side is missing)
+            state = self._step('state', (), (self.add(node[2]), self.add(node[3])))
+            change = self._binary('sub', state, self._step('shift', (1,), (state,)))
+            up = self._binary('eq', change, self._step('const', (1.0,)))
+            down = self._binary('eq', change, self._step('const', (-1.0,)))
+            return {'above': up, 'below': down}.get(node[1]) or self._step('or', (), (up, down))
+        return self._call(node[1], node[2])
+
+    def _call(self, name, args):
+        if name not in FUNCTIONS:
+            raise RuleError(f'Unknown function {name}()')
+        low, high = FUNCTIONS[name]
+        if not low <= len(args) <= high:
+            expected = low if low == high else f'{low} to {high}'
+            raise RuleError(f'{name}() takes {expected} arguments, got {len(args)}')
+        if name == 'pattern':
+            if args[0][0] != 'name' or args[0][1] not in PATTERNS:
+                raise RuleError(f'pattern() needs one of {", ".join(PATTERNS)}')
+            return self._step('pattern', (PATTERNS[args[0][1]],), (self._step('bitmask'),))
+
+        steps = [self.add(arg) for arg in args]
+
+        def field(name):
+            return self._step('field', (FIELDS[name],))
+
+        if name in ('ema', 'sma', 'highest', 'lowest'):
+            default = {'highest': 'high', 'lowest': 'low'}.get(name, 'close')
+            source = steps[1] if len(steps) > 1 else field(default)
+            op = {'highest': 'max', 'lowest': 'min'}.get(name, name)
+            return self._step(op, (self._integer(steps[0], name),), (source,))
+        if name in ('shift', 'prev'):
+            return self._step('shift', (self._integer(steps[1], name, 0) if len(steps) > 1 else 1,), (steps[0],))
+        if name == 'wr':
+            # Williams %R spelled out as in indicators.williams_r, so its rolling
+            # max/min are shared with highest()/lowest() in other rules
+            period = self._integer(steps[0], name) if steps else 14
+            highest = self._step('max', (period,), (field('high'),))
+            lowest = self._step('min', (period,), (field('low'),))
+            ratio = self._binary('div', self._binary('sub', highest, field('close')),
+                                 self._binary('sub', highest, lowest))
+            return self._binary('mul', ratio, self._step('const', (-100.0,)))
+        if name in ('support', 'resistance'):
+            period = self._integer(steps[0], name) if steps else 14
+            levels = self._step('levels', (period,), (field('low'), field('high')))
+            return self._step(name, (), (levels,))
+        # within(x, level, pct): the band add_signals uses around a level
+        x, level, pct = steps
+        pct = self._constant(pct)
+        if pct is None:
+            raise RuleError('within() needs a number as its percentage')
+        high_band = self._binary('mul', level, self._step('const', (1 + pct / 100,)))
+        low_band = self._binary('mul', level, self._step('const', (1 - pct / 100,)))
+        return self._step('and', (), (self._binary('le', x, high_band), self._binary('ge', x, low_band)))
+
+    # Function to list the steps, one per line, for debugging a plan
+    def describe(self):
+        lines = []
+        for i, (op, params, inputs) in enumerate(self.steps):
+            arguments = [repr(param) for param in params] + [f'#{step}' for step in inputs]
+            lines.append(f'#{i} = {op}({", ".join(arguments)})')
+        lines += [f'{name} = #{step}' for name, step in self.outputs.items()]
+        return '\n'.join(lines)
+
+    # Function to evaluate every rule over one ticker (a frame with Open, High,
+    # Low, Close columns) or a (field, ticker) panel. Returns a boolean frame with
+    # a column per rule for one ticker, or {rule: boolean (time x ticker) frame}.
+    @timed(name='evaluate_rules')
+    def evaluate(self, data):
+        panel = isinstance(data.columns, pd.MultiIndex)
+        tickers = data['Close'].columns if panel else None
+        values = []
+        for op, params, inputs in self.steps:
+            values.append(_evaluate_step(data, tickers, op, params, [values[step] for step in inputs]))
+        count('rule steps', len(self.steps))
+
+        def result(step):
+            return np.broadcast_to(_truth(values[step]), (len(data),) + ((len(tickers),) if panel else ()))
+
+        if panel:
+            return {name: pd.DataFrame(result(step), index=data.index, columns=tickers)
+                    for name, step in self.outputs.items()}
+        return pd.DataFrame({name: result(step) for name, step in self.outputs.items()}, index=data.index)
+
+
+def _frame(values, tickers):
+    return pd.Series(values) if tickers is None else pd.DataFrame(values)
+
+
+# Function to read a value as a condition: numbers are true when non-zero, NaN is false
+def _truth(values):
+    values = np.asarray(values)
+    return values if values.dtype == bool else np.nan_to_num(values) != 0
+
+
+def _shift(values, k):
+    shifted = np.empty_like(values)
+    shifted[:k] = False if values.dtype == bool else np.nan
+    shifted[k:] = values[:len(values) - k]
+    return shifted
+
+
+# Function to compute one step from the values of its inputs
+def _evaluate_step(data, tickers, op, params, args):
+    if op == 'const':
+        return params[0]
+    if op == 'field':
+        if params[0] not in data.columns.get_level_values(0):
+            raise RuleError(f'The data has no {params[0]} column')
+        column = data[params[0]]
+        return (column if tickers is None else column[tickers]).to_numpy(dtype='float64')
+    if op == 'bitmask':
+        fields = [data[name] if tickers is None else data[name][tickers] for name in ('Open', 'High', 'Low', 'Close')]
+        return pattern_bitmask(*(field.to_numpy() for field in fields))
+    if op == 'pattern':
+        return (args[0] & np.uint32(params[0])) != 0
+    if op in ('max', 'min', 'sma'):
+        rolling = _frame(args[0], tickers).rolling(window=params[0])
+        return {'max': rolling.max, 'min': rolling.min, 'sma': rolling.mean}[op]().to_numpy()
+    if op == 'ema':
+        return _frame(args[0], tickers).ewm(span=params[0], adjust=False).mean().to_numpy()
+    if op == 'shift':
+        return _shift(np.asarray(args[0]), params[0]) if np.ndim(args[0]) else args[0]
+    if op == 'levels':
+        lows, highs = _frame(args[0], tickers), _frame(args[1], tickers)
+        levels = identify_support_resistance_levels({'Low': lows, 'High': highs}, period=params[0])
+        if tickers is None:
+            return levels
+        return [levels[j] for j in lows.columns]
+    if op in ('support', 'resistance'):
+        # Most touched level, per ticker for a panel; missing levels never match
+        position = 1 if op == 'support' else 3
+        levels = [args[0]] if tickers is None else args[0]
+        values = np.array([np.nan if level[position] is None else level[position] for level in levels],
+                          dtype='float64')
+        return values[0] if tickers is None else values
+    if op == 'not':
+        return ~_truth(args[0])
+    if op == 'state':
+        a, b = np.broadcast_arrays(*args)
+        return np.where(np.isnan(a) | np.isnan(b), np.nan, a > b)
+    a, b = args
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if op in ('and', 'or'):
+            return (np.logical_and if op == 'and' else np.logical_or)(_truth(a), _truth(b))
+        return {'add': np.add, 'sub': np.subtract, 'mul': np.multiply, 'div': np.divide,
+                'lt': np.less, 'le': np.less_equal, 'gt': np.greater, 'ge': np.greater_equal,
+                'eq': np.equal, 'ne': np.not_equal}[op](a, b)
+
+
+# Function to compile rules (one rule, or a dict of name -> rule) into one Plan
+def compile_rules(rules):
+    if isinstance(rules, str):
+        rules = {'Signal': rules}
+    plan = Plan()
+    for name, text in rules.items():
+        try:
+            plan.outputs[name] = plan.add(parse_rule(text))
+        except RuleError as e:
+            raise RuleError(f'{name}: {e}') from None
+    return plan
+
+
+# Function to evaluate a single rule; a boolean Series for one ticker, a
+# boolean (time x ticker) frame for a panel
+def evaluate_rule(rule, data):
+    result = compile_rules({'Signal': rule}).evaluate(data)
+    return result['Signal']
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_store import get_store
+from patterns import pattern_names
+from levels import UniverseLevels
+from indicators import (williams_r, identify_support_resistance_levels, generate_trading_signals,
+                        generate_signals, identify_candle_patterns, add_signals)
+
+# Signal columns reported for every ticker, in display order
+SIGNAL_COLUMNS = ['Bullish After Bearish', 'Bearish Engulfing', 'Williams %R Buy', 'Williams %R Sell',
+                  'EMA Buy', 'EMA Sell', 'Support Buy', 'Resistance Sell']
+
+
+# Function to evaluate every signal of the apps on every bar of one ticker's
+# history. Returns the close, Williams %R, one boolean column per signal, the
+# number of signals firing and the candle pattern bitmask (see patterns.py).
+def signal_history(data, percentage=2, ema1_period=12, ema2_period=26, wr_period=14):
+    history = pd.DataFrame({'Close': data['Close']}, index=data.index)
+
+    # Candle patterns
+    patterns = identify_candle_patterns(data)
+    history['Bullish After Bearish'] = patterns['Bullish After Bearish']
+    history['Bearish Engulfing'] = patterns['Bearish Engulfing']
+
+    # Williams %R with support/resistance
+    wr_data = data.copy()
+    wr_data['Williams %R'] = williams_r(wr_data, wr_period)
+    _, most_support, _, most_resistance = identify_support_resistance_levels(wr_data, period=wr_period)
+    buy_signals, sell_signals = generate_trading_signals(wr_data, most_support, most_resistance)
+    history['Williams %R'] = wr_data['Williams %R']
+    history['Williams %R Buy'] = data.index.isin(buy_signals)
+    history['Williams %R Sell'] = data.index.isin(sell_signals)
+
+    # EMA crossover
+    buy_signals, sell_signals = generate_signals(data.copy(), ema1_period, ema2_period)
+    history['EMA Buy'] = data.index.isin(buy_signals.index)
+    history['EMA Sell'] = data.index.isin(sell_signals.index)
+
+    # Threshold bands around the period's min/max close
+    bands = add_signals(data.copy(), data['Close'].min(), data['Close'].max(), percentage)
+    history['Support Buy'] = bands['Buy'].to_numpy()
+    history['Resistance Sell'] = bands['Sell'].to_numpy()
+
+    history['Signals'] = history[SIGNAL_COLUMNS].sum(axis=1)
+    history['Patterns'] = patterns['Patterns']
+    return history
+
+
+# Function to read a ticker from the store, failing on an empty history
+def load_history(ticker, start, end):
+    data = get_store().read(ticker, start=start, end=end)
+    if data.empty:
+        raise ValueError('no data returned')
+    return data
+
+
+# Function to evaluate every signal of the apps on the latest bar of one ticker.
+# Any failure is reported in the 'Error' column rather than raised, so one bad
+# symbol can't abort a whole scan.
+def scan_ticker(ticker, start, end, percentage=2, ema1_period=12, ema2_period=26, wr_period=14):
+    row = {'Ticker': ticker}
+    try:
+        data = load_history(ticker, start, end)
+        latest = signal_history(data, percentage, ema1_period, ema2_period, wr_period).iloc[-1]
+        row['Date'] = data.index[-1]
+        row['Close'] = float(latest['Close'])
+        row['Williams %R'] = float(latest['Williams %R'])
+        for column in SIGNAL_COLUMNS:
+            row[column] = bool(latest[column])
+        row['Signals'] = int(latest['Signals'])
+        row['Patterns'] = ', '.join(pattern_names(latest['Patterns']))
+        row['Error'] = ''
+    except Exception as e:
+        row['Error'] = f'{type(e).__name__}: {e}'
+    return row
+
+
+# Function to compute the per-bar signals of one ticker for a batch run; returns
+# (ticker, history or None, error message)
+def history_ticker(ticker, start, end, **params):
+    try:
+        history = signal_history(load_history(ticker, start, end), **params)
+        history['Patterns'] = [', '.join(pattern_names(bits)) if bits else '' for bits in history['Patterns']]
+        return ticker, history, ''
+    except Exception as e:
+        return ticker, None, f'{type(e).__name__}: {e}'
+
+
+# Function to list the tickers whose latest close is within `within` percent of
+# one of their k strongest pivot levels over [start, end), closest first.
+# Reads what the store already holds (scan_universe refreshes it).
+def scan_levels(tickers, start, end, tolerance=2, within=1.0, period=14, k=5):
+    universe = UniverseLevels(tolerance, period, k)
+    for ticker in dict.fromkeys(tickers):
+        data = get_store().read(ticker, start=start, end=end, refresh=False)
+        if len(data):
+            universe.add(ticker, data)
+    return universe.near(within)
+
+
+# Function to start a process pool whose workers begin from a fresh interpreter
+# (forkserver, or spawn where that is missing) instead of a fork of this one.
+# The apps run in Streamlit's threads, and a fork taken while another thread
+# holds the store, rate limiter or cache lock would leave that lock held for
+# good in the child. Workers rebuild what they need through get_store().
+def process_pool(max_workers):
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+
+
+# Function to scan a list of tickers in a process pool and collect one row per ticker
+def scan_universe(tickers, start, end, max_workers=None, **params):
+    tickers = list(dict.fromkeys(tickers))
+    max_workers = max_workers or min(len(tickers), os.cpu_count() or 1) or 1
+    # Download everything up front, concurrently; the workers then read from the
+    # store, and report the tickers that failed here when their own refresh fails
+    get_store().refresh_many(tickers, start, end)
+    rows = []
+    with process_pool(max_workers) as pool:
+        futures = {pool.submit(scan_ticker, ticker, start, end, **params): ticker for ticker in tickers}
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                # The worker itself died (e.g. killed or unpicklable result)
+                rows.append({'Ticker': futures[future], 'Error': f'{type(e).__name__}: {e}'})
+
+    results = pd.DataFrame(rows, columns=['Ticker', 'Date', 'Close', 'Williams %R'] + SIGNAL_COLUMNS
+                           + ['Signals', 'Patterns', 'Error'])
+    return results.sort_values(['Signals', 'Ticker'], ascending=[False, True], na_position='last',
+                               ignore_index=True)
@@ -0,0 +1,57 @@
+import streamlit as st
+from datetime import datetime, timedelta
+from scanner import scan_universe, scan_levels
+from universe import get_top_stocks, top_stocks
+from instrumentation import start_run, stage, sidebar_report
+
+def main():
+    # Title for the Streamlit app
+    st.title("Stock Screener: Latest Bar Signals")
+
+    # Universe to scan
+    universe_name = st.sidebar.selectbox("Select Universe:",
+                                         ["Candlestick Top 50", "Support/Resistance Top 50", "Both"])
+    if universe_name == "Candlestick Top 50":
+        tickers = list(get_top_stocks().values())
+    elif universe_name == "Support/Resistance Top 50":
+        tickers = top_stocks
+    else:
+        tickers = list(get_top_stocks().values()) + top_stocks
+
+    # Lookback used by every indicator
+    lookback_days = st.sidebar.selectbox("Lookback:", [90, 180, 365, 730], index=2,
+                                         format_func=lambda days: f"{days} days")
+
+    # Signal parameters, same defaults as the single-ticker apps
+    percentage = st.sidebar.slider("Threshold Percentage (%)", 1, 20, 2)
+    ema1_period = st.sidebar.slider("EMA1 Length:", min_value=1, max_value=200, value=12)
+    ema2_period = st.sidebar.slider("EMA2 Length:", min_value=1, max_value=200, value=26)
+
+    # How close to a strong support/resistance level counts as "at" it
+    proximity = st.sidebar.slider("Level Proximity (%)", 0.5, 5.0, 1.0, step=0.5)
+
+    if st.button("Run Scan"):
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=lookback_days)
+        with st.spinner(f"Scanning {len(set(tickers))} tickers..."), stage('scan'):
+            results = scan_universe(tickers, start_date, end_date, percentage=percentage,
+                                    ema1_period=ema1_period, ema2_period=ema2_period)
+
+        failed = results[results['Error'] != '']
+        st.write(f"{(results['Signals'] > 0).sum()} tickers fired at least one signal on their latest bar.")
+        st.dataframe(results[results['Error'] == ''].drop(columns='Error'), hide_index=True)
+        if len(failed):
+            st.write(f"{len(failed)} tickers could not be scanned:")
+            st.dataframe(failed[['Ticker', 'Error']], hide_index=True)
+
+        # Tickers sitting on one of their strongest pivot levels, bucketed with
+        # the threshold percentage
+        with stage('levels'):
+            near = scan_levels(tickers, start_date, end_date, tolerance=percentage, within=proximity)
+        st.write(f"{len(near)} tickers are within {proximity}% of one of their strongest levels:")
+        st.dataframe(near, hide_index=True)
+
+if __name__ == "__main__":
+    start_run('screener')
+    main()
+    sidebar_report()
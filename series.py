@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from charts import MAX_POINTS, resample_ohlc
+from result_cache import cached
+from shared_store import get_shared_cache
+
+# Longest window any app offers (SupportResistance.py's "5 Years"); every
+# shorter period is sliced out of it
+MAX_LOOKBACK = timedelta(days=5 * 365)
+
+
+# Price history of one ticker loaded once for the longest window, with weekly
+# and monthly candles precomputed. Period changes are answered by binary search
+# on the date index and return views, so they need no I/O and no copying.
+class MultiResolutionSeries:
+    RESOLUTIONS = ['Daily', 'Weekly', 'Monthly']
+
+    def __init__(self, daily, view=None):
+        # Shared rows the daily frame is a view of, held for as long as this object lives
+        self.view = view
+        self.levels = {
+            'Daily': daily,
+            'Weekly': resample_ohlc(daily, 'W'),
+            'Monthly': resample_ohlc(daily, 'M'),
+        }
+        self._dates = {name: frame.index.values for name, frame in self.levels.items()}
+
+    # Lets the result cache account for the frames this object holds
+    def __sizeof__(self):
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in self.levels.values()))
+
+    @property
+    def daily(self):
+        return self.levels['Daily']
+
+    # Bars with start <= date < end at the given resolution
+    def window(self, start, end=None, resolution='Daily'):
+        dates = self._dates[resolution]
+        lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side='left')
+        return self.levels[resolution].iloc[lo:hi]
+
+    # Bars of the last `lookback` (a timedelta) up to now
+    def last(self, lookback, resolution='Daily'):
+        return self.window(datetime.now() - lookback, resolution=resolution)
+
+    # Finest precomputed candles of the window that fit the point budget
+    def candles(self, start, end=None, max_points=MAX_POINTS):
+        for resolution in self.RESOLUTIONS:
+            candles = self.window(start, end, resolution)
+            if len(candles) <= max_points:
+                break
+        return candles, (None if resolution == 'Daily' else resolution)
+
+
+# Function to get the shared multi-resolution series of a ticker, loading the
+# whole MAX_LOOKBACK window (from the local store) on first use. Its daily
+# candles are a read-only view (float32 prices) of the process-wide shared cache.
+@cached
+def load_series(ticker, lookback=MAX_LOOKBACK):
+    start = (datetime.now() - lookback).date()
+    view = get_shared_cache().acquire(ticker, start, datetime.now())
+    return MultiResolutionSeries(view.frame(), view)
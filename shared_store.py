@@ -0,0 +1,164 @@
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from data_store import PRICE_COLUMNS, get_store
+from instrumentation import count
+
+# Bytes of compact data kept mapped without any view using it
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+# One version of one stored series, shared by every view of it
+class _Entry:
+    def __init__(self, key, version, index, prices, volume):
+        self.key = key
+        self.version = version
+        self.index = index
+        self.prices = prices
+        self.volume = volume
+        self.nbytes = index.nbytes + prices.nbytes + volume.nbytes
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+
+# Read-only, zero-copy rows [lo, hi) of a shared series. Release it (or use it
+# as a context manager) when done; views that are simply dropped are released
+# when garbage collected.
+class OHLCVView:
+    def __init__(self, cache, entry, lo, hi):
+        self.ticker, self.interval = entry.key
+        self.timestamps = entry.index[lo:hi]
+        self.prices = entry.prices[lo:hi]
+        self.volume = entry.volume[lo:hi]
+        self._release = weakref.finalize(self, cache._release, entry)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    # DataFrame over the shared arrays (no copy); its values are read-only
+    def frame(self):
+        index = pd.DatetimeIndex(self.timestamps.view('datetime64[ns]'), name='Date')
+        prices = pd.DataFrame(self.prices, index=index, columns=PRICE_COLUMNS, copy=False)
+        volume = pd.DataFrame(self.volume, index=index, columns=['Volume'], copy=False)
+        return pd.concat([prices, volume], axis=1, copy=False)
+
+    def release(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# Process-wide cache of compact (float32 prices, float64 volume, int64
+# timestamps) OHLCV series.
+#
+# Every session asking for a ticker gets a view of the same memory-mapped
+# arrays, so memory grows with the number of distinct tickers rather than with
+# users, and the OS shares the mapped pages with other processes reading the
+# same store. Series are reference counted; unused ones are evicted least
+# recently used first once more than max_bytes are mapped. When the store gets
+# new bars, new views see the new version and the old one is dropped once its
+# last view is released.
+class SharedOHLCVCache:
+    def __init__(self, store=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.store = store or get_store()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._entries = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+
+    def _entry(self, ticker, interval):
+        key = (ticker, interval)
+        version, index, prices, volume = self.store.read_compact(ticker, interval)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self.hits += 1
+            else:
+                if entry is not None:
+                    self._drop(entry)
+                if version is None:
+                    index = np.empty(0, dtype='int64')
+                    prices = np.empty((0, len(PRICE_COLUMNS)), dtype='float32')
+                    volume = np.empty((0, 1), dtype='float64')
+                entry = self._entries[key] = _Entry(key, version, index, prices, volume)
+                self.bytes += entry.nbytes
+                self.loads += 1
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+            self._evict()
+        return entry
+
+    # Return a view of the bars with start <= t < end, refreshing the store first
+    def acquire(self, ticker, start, end=None, interval='1d', refresh=True):
+        if refresh:
+            self.store.refresh(ticker, start, end, interval)
+        entry = self._entry(ticker, interval)
+        lo = np.searchsorted(entry.index, pd.Timestamp(start).value, side='left')
+        hi = len(entry.index) if end is None else np.searchsorted(entry.index, pd.Timestamp(end).value, side='left')
+        count('rows read', hi - lo)
+        return OHLCVView(self, entry, lo, hi)
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            if entry.refs == 0 and entry in self._retired:
+                self._retired.discard(entry)
+                self.bytes -= entry.nbytes
+            self._evict()
+
+    # Take an entry out of the cache; one still in use is retired until released
+    def _drop(self, entry):
+        del self._entries[entry.key]
+        if entry.refs:
+            self._retired.add(entry)
+        else:
+            self.bytes -= entry.nbytes
+
+    def _evict(self):
+        if self.bytes <= self.max_bytes:
+            return
+        for entry in sorted(self._entries.values(), key=lambda entry: entry.last_used):
+            if self.bytes <= self.max_bytes:
+                break
+            if entry.refs == 0:
+                self._drop(entry)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'series': len(self._entries),
+                'retired': len(self._retired),
+                'views': sum(entry.refs for entry in self._entries.values())
+                         + sum(entry.refs for entry in self._retired),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'loads': self.loads,
+                'evictions': self.evictions,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+# Function to get the shared series cache of this process
+def get_shared_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SharedOHLCVCache()
+        return _default_cache
@@ -1,53 +1,46 @@
 # Save this code in a file named `app.py`
 
 import streamlit as st
-import yfinance as yf
 import plotly.graph_objects as go
-import pandas as pd
-import numpy as np  # Import numpy
+from data_store import get_store
+from indicators import generate_signals
+from ema_sweep import ema_matrix, sweep_crossovers
+from result_cache import cached
+from charts import add_candles, add_line, add_markers
+from instrumentation import start_run, stage, sidebar_report
+from live import live_controls, live_panel
 
+@cached
 def get_nasdaq_data():
-    data = yf.download('^IXIC', start='2024-01-01', end='2024-09-07')
+    data = get_store().read('^IXIC', start='2024-01-01', end='2024-09-07')
     return data
 
-def calculate_ema(data, period):
-    return data['Close'].ewm(span=period, adjust=False).mean()
+@cached
+def get_ema_matrix(data):
+    return ema_matrix(data['Close'])
 
-def generate_signals(data, ema1_period, ema2_period):
-    data['EMA1'] = calculate_ema(data, ema1_period)
-    data['EMA2'] = calculate_ema(data, ema2_period)
-    
-    # Generate signals
-    data['Signal'] = 0
-    data['Signal'] = np.where(data['EMA1'] > data['EMA2'], 1, 0)
-    data['Position'] = data['Signal'].diff()
-    
-    # Buy and Sell signals
-    buy_signals = data[data['Position'] == 1]
-    sell_signals = data[data['Position'] == -1]
-    
-    return buy_signals, sell_signals
+@cached
+def get_sweep(data, ema):
+    return sweep_crossovers(data['Close'], ema)
 
-def plot_ema_chart(data, ema1_period, ema2_period):
-    buy_signals, sell_signals = generate_signals(data, ema1_period, ema2_period)
+@cached
+def plot_ema_chart(data, ema1_period, ema2_period, ema=None):
+    # Work on a copy, the cached data is shared with other sessions
+    data = data.copy()
+    buy_signals, sell_signals = generate_signals(data, ema1_period, ema2_period, ema)
     
     fig = go.Figure()
     
     # Candlestick Chart
-    fig.add_trace(go.Candlestick(x=data.index,
-                                 open=data['Open'],
-                                 high=data['High'],
-                                 low=data['Low'],
-                                 close=data['Close'],
-                                 name='Candlestick'))
+    add_candles(fig, data)
     
     # EMA Lines
-    fig.add_trace(go.Scatter(x=data.index, y=data['EMA1'], mode='lines', name=f'EMA {ema1_period}', line=dict(color='blue')))
-    fig.add_trace(go.Scatter(x=data.index, y=data['EMA2'], mode='lines', name=f'EMA {ema2_period}', line=dict(color='red')))
+    add_line(fig, data['EMA1'], f'EMA {ema1_period}', line=dict(color='blue'))
+    add_line(fig, data['EMA2'], f'EMA {ema2_period}', line=dict(color='red'))
     
     # Buy and Sell Signals
-    fig.add_trace(go.Scatter(x=buy_signals.index, y=buy_signals['Close'], mode='markers', name='Buy Signal', marker=dict(color='green', symbol='triangle-up', size=10)))
-    fig.add_trace(go.Scatter(x=sell_signals.index, y=sell_signals['Close'], mode='markers', name='Sell Signal', marker=dict(color='red', symbol='triangle-down', size=10)))
+    add_markers(fig, buy_signals.index, buy_signals['Close'], 'Buy Signal', color='green', symbol='triangle-up')
+    add_markers(fig, sell_signals.index, sell_signals['Close'], 'Sell Signal', color='red', symbol='triangle-down')
     
     fig.update_layout(title='NASDAQ with EMAs and Trading Signals',
                       xaxis_title='Date',
@@ -56,19 +49,60 @@ def plot_ema_chart(data, ema1_period, ema2_period):
     
     return fig
 
+@cached
+def plot_sweep_heatmap(returns):
+    fig = go.Figure(go.Heatmap(x=returns.columns, y=returns.index, z=returns.values,
+                               colorscale='RdYlGn', zmid=0, colorbar=dict(title='Return %'),
+                               hovertemplate='EMA1 %{y}<br>EMA2 %{x}<br>Return %{z:.2f}%<extra></extra>'))
+    
+    fig.update_layout(title='EMA Crossover Return by EMA Pair',
+                      xaxis_title='EMA2 Length',
+                      yaxis_title='EMA1 Length')
+    
+    return fig
+
 def main():
     st.title('NASDAQ Chart with EMAs and Trading Signals')
     
     # Fetch data
-    data = get_nasdaq_data()
+    with stage('load data'):
+        data = get_nasdaq_data()
+    
+    # Every EMA length the sliders can pick, computed once
+    with stage('EMA matrix'):
+        ema = get_ema_matrix(data)
+    
+    mode = st.radio('Mode:', ['Single Pair', 'Parameter Sweep'], horizontal=True)
+    if mode == 'Parameter Sweep':
+        with stage('sweep'):
+            returns, buys = get_sweep(data, ema)
+        best_ema1, best_ema2 = returns.stack().idxmax()
+        st.write(f'Best pair: EMA{best_ema1} / EMA{best_ema2} with a return of '
+                 f'{returns.loc[best_ema1, best_ema2]:.2f}% over {buys.loc[best_ema1, best_ema2]} trades')
+        with stage('build figure'):
+            fig = plot_sweep_heatmap(returns)
+        with stage('render chart'):
+            st.plotly_chart(fig)
+        return
     
     # EMA Period Inputs
     ema1_period = st.slider('Select EMA1 Length:', min_value=1, max_value=200, value=12)
     ema2_period = st.slider('Select EMA2 Length:', min_value=1, max_value=200, value=26)
     
+    # Live mode polls the newest bars and only redraws their recent tail
+    live, live_interval, refresh = live_controls()
+    if live:
+        live_panel('^IXIC', live_interval, refresh, 'Live NASDAQ with EMAs and Trading Signals',
+                   ema1_period=ema1_period, ema2_period=ema2_period, williams_r=False)
+        return
+    
     # Generate and Plot Chart
-    fig = plot_ema_chart(data, ema1_period, ema2_period)
-    st.plotly_chart(fig)
+    with stage('build figure'):
+        fig = plot_ema_chart(data, ema1_period, ema2_period, ema)
+    with stage('render chart'):
+        st.plotly_chart(fig)
 
 if __name__ == "__main__":
+    start_run('signals')
     main()
+    sidebar_report()
@@ -0,0 +1,143 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from indicators import williams_r, identify_candle_patterns
+
+
+# Function to read one field of a bar given as a dict, a DataFrame row or a plain number
+def bar_value(bar, field):
+    if isinstance(bar, (int, float, np.number)):
+        return float(bar)
+    return float(bar[field])
+
+
+# Running EMA with the same recurrence (and missing value handling) as
+# data['Close'].ewm(span=span, adjust=False).mean()
+class StreamingEMA:
+    def __init__(self, span, field='Close'):
+        self.span = span
+        self.field = field
+        self.alpha = 1.0 / (1.0 + (span - 1.0) / 2.0)
+        self.value = math.nan
+        self._old_wt = 1.0
+
+    def update(self, bar):
+        cur = bar_value(bar, self.field)
+        if self.value == self.value:
+            self._old_wt *= 1.0 - self.alpha
+            if cur == cur:
+                if self.value != cur:
+                    self.value = (self._old_wt * self.value + self.alpha * cur) / (self._old_wt + self.alpha)
+                self._old_wt = 1.0
+        elif cur == cur:
+            self.value = cur
+        return self.value
+
+    # Bulk warm-up from history; returns the EMA of every bar
+    def warm_up(self, data):
+        values = data[self.field] if isinstance(data, pd.DataFrame) else pd.Series(data, dtype='float64')
+        ema = values.ewm(span=self.span, adjust=False).mean()
+        if len(ema):
+            self.value = float(ema.iloc[-1])
+            # Missing values after the last observation keep decaying the old weight
+            self._old_wt = 1.0
+            if self.value == self.value:
+                observed = np.flatnonzero(values.notna().to_numpy())
+                for _ in range(len(values) - 1 - observed[-1]):
+                    self._old_wt *= 1.0 - self.alpha
+        return ema
+
+
+# Rolling max (or min) over the last `period` bars using a monotonic deque, so
+# each update is O(1) amortised. Like pandas, it is NaN until the window holds
+# `period` non-missing values.
+class RollingExtreme:
+    def __init__(self, period, mode='max'):
+        self.period = period
+        self.mode = mode
+        self._count = 0
+        self._candidates = deque()
+        self._missing = deque()
+
+    def update(self, value):
+        position = self._count
+        self._count += 1
+        window_start = position - self.period + 1
+
+        # Drop what has slid out of the window
+        while self._candidates and self._candidates[0][0] < window_start:
+            self._candidates.popleft()
+        while self._missing and self._missing[0] < window_start:
+            self._missing.popleft()
+
+        if value == value:
+            if self.mode == 'max':
+                while self._candidates and self._candidates[-1][1] <= value:
+                    self._candidates.pop()
+            else:
+                while self._candidates and self._candidates[-1][1] >= value:
+                    self._candidates.pop()
+            self._candidates.append((position, value))
+        else:
+            self._missing.append(position)
+
+        observed = min(self._count, self.period) - len(self._missing)
+        if observed < self.period or not self._candidates:
+            return math.nan
+        return self._candidates[0][1]
+
+
+# Running Williams %R, identical to williams_r(df, period)
+class StreamingWilliamsR:
+    def __init__(self, period=14):
+        self.period = period
+        self.value = math.nan
+        self._highest = RollingExtreme(period, 'max')
+        self._lowest = RollingExtreme(period, 'min')
+
+    def update(self, bar):
+        highest_high = np.float64(self._highest.update(bar_value(bar, 'High')))
+        lowest_low = np.float64(self._lowest.update(bar_value(bar, 'Low')))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.value = float((highest_high - bar_value(bar, 'Close')) / (highest_high - lowest_low) * -100)
+        return self.value
+
+    # Bulk warm-up from history; returns Williams %R of every bar
+    def warm_up(self, data):
+        wr = williams_r(data, self.period)
+        # Only the last `period` bars matter for the rolling state
+        self._highest = RollingExtreme(self.period, 'max')
+        self._lowest = RollingExtreme(self.period, 'min')
+        for _, bar in data[['High', 'Low', 'Close']].iloc[-self.period:].iterrows():
+            self.update(bar)
+        return wr
+
+
+# Two-bar candle pattern detector giving the same flags as identify_candle_patterns
+class StreamingCandlePatterns:
+    def __init__(self):
+        self._prev_open = math.nan
+        self._prev_close = math.nan
+
+    def update(self, bar):
+        open_, close = bar_value(bar, 'Open'), bar_value(bar, 'Close')
+        prev_open, prev_close = self._prev_open, self._prev_close
+        patterns = {
+            'Bullish After Bearish': (close > open_ and prev_close < prev_open
+                                      and prev_close > open_ and prev_open < close),
+            'Bearish Engulfing': (close < open_ and prev_close > prev_open
+                                  and prev_close < open_ and prev_open > close),
+        }
+        self._prev_open, self._prev_close = open_, close
+        return patterns
+
+    # Bulk warm-up from history; returns both pattern columns for every bar
+    def warm_up(self, data):
+        patterns = identify_candle_patterns(data)
+        if len(data):
+            self._prev_open = float(data['Open'].iloc[-1])
+            self._prev_close = float(data['Close'].iloc[-1])
+        return patterns[['Bullish After Bearish', 'Bearish Engulfing']]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import band_signals, run_backtest
+from benchmark import simulate_roi
+from conftest import make_ohlcv
+from indicators import add_signals
+
+
+def test_roi_matches_the_per_bar_loop():
+    for seed in range(4):
+        # A price swinging between the bands, so positions are opened and closed many times
+        data = make_ohlcv(750, seed=seed)
+        data['Close'] = 100 + 10 * np.sin(np.arange(len(data)) / 8) + data['Close'] / 20
+        data = add_signals(data, data['Close'].quantile(0.1), data['Close'].quantile(0.9), 3)
+        result = run_backtest(data['Close'], data['Buy'], data['Sell'])
+        roi, buy_rows, sell_rows = simulate_roi(data)
+        assert buy_rows and sell_rows
+        assert result.summary['ROI %'].iloc[0] == pytest.approx(roi, rel=1e-12)
+
+        trades = result.trades
+        assert list(trades.loc[trades['Side'] == 'Buy', 'Date']) == list(data.index[buy_rows])
+        assert list(trades.loc[trades['Side'] == 'Sell', 'Date']) == list(data.index[sell_rows])
+
+
+def test_panel_matches_each_ticker():
+    frames = {f'T{seed}': make_ohlcv(500, seed=seed) for seed in range(5)}
+    close = pd.DataFrame({ticker: data['Close'] for ticker, data in frames.items()})
+    buy, sell = band_signals(close, 10)
+    result = run_backtest(close, buy, sell)
+    for ticker, data in frames.items():
+        data = add_signals(data, data['Close'].min(), data['Close'].max(), 10)
+        roi, buy_rows, sell_rows = simulate_roi(data)
+        row = result.summary.loc[ticker]
+        assert row['ROI %'] == pytest.approx(roi, rel=1e-12)
+        assert (row['Buys'], row['Sells']) == (len(buy_rows), len(sell_rows))
+
+
+def test_no_buys_gives_zero_roi():
+    data = make_ohlcv(100)
+    never = pd.Series(False, index=data.index)
+    result = run_backtest(data['Close'], never, data['Close'] > 0)
+    assert result.summary['ROI %'].iloc[0] == simulate_roi(data.assign(Buy=never, Sell=True))[0] == 0
+    assert result.trades.empty
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from conftest import make_ohlcv
+from data_store import CSVProvider, DataProvider, OHLCVStore
+
+
+# CSVProvider that records every range asked of it
+class RecordingProvider(CSVProvider):
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.calls = []
+
+    def fetch(self, ticker, start, end, interval='1d'):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        return super().fetch(ticker, start, end, interval)
+
+
+class FailingProvider(DataProvider):
+    def fetch(self, ticker, start, end, interval='1d'):
+        raise ConnectionError('offline')
+
+
+@pytest.fixture
+def provider(tmp_path):
+    make_ohlcv(300, start='2020-01-02').to_csv(tmp_path / 'AAA.csv')
+    return RecordingProvider(str(tmp_path))
+
+
+@pytest.fixture
+def store(tmp_path, provider):
+    return OHLCVStore(root=str(tmp_path / 'store'), provider=provider, refresh_interval=timedelta(0))
+
+
+def version(store):
+    return store._load_meta(store._directory('AAA', '1d'))['version']
+
+
+def test_incremental_refresh_only_fetches_missing_ranges(store, provider):
+    first = store.read('AAA', '2020-06-01', '2020-09-01')
+    assert provider.calls == [(pd.Timestamp('2020-06-01'), pd.Timestamp('2020-09-01'))]
+
+    data = store.read('AAA', '2020-03-01', '2020-10-01')
+    # Only the older range and the tail from the last stored bar are asked for
+    assert provider.calls[1] == (pd.Timestamp('2020-03-01'), pd.Timestamp('2020-06-01'))
+    assert provider.calls[2] == (first.index[-1], pd.Timestamp('2020-10-01'))
+
+    expected = CSVProvider(provider.directory).fetch('AAA', '2020-03-01', '2020-10-01')
+    assert data.index.equals(expected.index)
+    assert (data.to_numpy() == expected[data.columns].to_numpy()).all()
+
+
+def test_refresh_without_new_bars_keeps_the_version(store, provider):
+    # A Saturday, then the rest of the weekend: the tail fetches return Friday's bar again
+    store.read('AAA', '2020-06-01', '2020-09-05')
+    store.read('AAA', '2020-06-01', '2020-09-06')
+    store.read('AAA', '2020-06-01', '2020-09-07')
+    assert len(provider.calls) == 3
+    assert version(store) == 1
+    assert store._load_meta(store._directory('AAA', '1d'))['checked_until'] == '2020-09-07T00:00:00'
+
+
+def test_empty_backfill_is_checked(store, provider):
+    store.read('AAA', '2020-01-02', '2020-03-01')
+    # Before the first bar: no bars, but the range is marked as asked for
+    assert not len(store.read('AAA', '2019-01-01', '2020-01-01'))
+    store.read('AAA', '2019-01-01', '2020-01-01')
+    assert [start for start, _ in provider.calls].count(pd.Timestamp('2019-01-01')) == 1
+    assert version(store) == 1
+
+
+def test_failed_download_is_not_checked(tmp_path, provider):
+    store = OHLCVStore(root=str(tmp_path / 'store'), provider=FailingProvider())
+    with pytest.raises(ConnectionError):
+        store.refresh('AAA', '2020-06-01', '2020-09-01')
+    assert store._load_meta(store._directory('AAA', '1d')) is None
+
+    store.provider = provider
+    assert len(store.read('AAA', '2020-06-01', '2020-09-01')) == 66
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from conftest import make_ohlcv
+from data_store import ChartProvider, OHLCVStore
+from fetcher import BulkFetcher
+from replay_server import ReplayServer, chart_payload
+
+
+def test_naive_times_are_exchange_local():
+    # One session of minute bars, stamped in New York time like parse_chart returns them
+    bars = make_ohlcv(390, start='2024-03-05 09:30', freq='min')
+    with ReplayServer({'AAA': bars}, timezone='America/New_York') as server:
+        fetcher = BulkFetcher(server.url, rate=None)
+        data = fetcher.fetch('AAA', '2024-03-05 09:30', '2024-03-05 11:01', interval='1m')
+        assert data.index[0] == pd.Timestamp('2024-03-05 09:30')
+        assert data.index[-1] == pd.Timestamp('2024-03-05 11:00')
+        assert fetcher.timezones['AAA'] == 'America/New_York'
+
+        # Aware times are converted to the exchange's timezone
+        data = fetcher.fetch('AAA', pd.Timestamp('2024-03-05 15:00', tz='UTC'),
+                             pd.Timestamp('2024-03-05 16:00', tz='UTC'), interval='1m')
+        assert data.index[0] == pd.Timestamp('2024-03-05 10:00')
+        assert data.index[-1] == pd.Timestamp('2024-03-05 10:59')
+
+
+def test_throttled_request_is_retried():
+    bars = make_ohlcv(20)
+    throttled = {'chart': {'result': None, 'error': {'code': 'Too Many Requests'}}}
+    responses = {'AAA': [(429, throttled, {'Retry-After': '0'}), (200, chart_payload('AAA', bars))]}
+    with ReplayServer(responses=responses) as server:
+        fetcher = BulkFetcher(server.url, rate=None, backoff=0.01)
+        data = fetcher.fetch('AAA', bars.index[0], bars.index[-1] + pd.Timedelta(days=1))
+    assert len(server.requests) == 2
+    assert (data['Close'].to_numpy() == bars['Close'].to_numpy()).all()
+
+
+def test_errors_are_reported_per_symbol():
+    bars = make_ohlcv(20)
+    with ReplayServer({'AAA': bars, 'BBB': bars}) as server:
+        frames, errors = BulkFetcher(server.url, rate=None).fetch_many(['AAA', 'ZZZ', 'BBB'], '2024-01-01', '2025-01-01')
+    assert sorted(frames) == ['AAA', 'BBB']
+    assert list(errors) == ['ZZZ']
+    assert 'HTTP 404' in errors['ZZZ']
+
+
+def test_store_refreshes_through_the_chart_api(tmp_path):
+    bars = make_ohlcv(100, start='2020-01-02')
+    with ReplayServer({'AAA': bars}) as server:
+        store = OHLCVStore(root=str(tmp_path), provider=ChartProvider(base_url=server.url, rate=None))
+        first = store.read('AAA', '2020-01-01', '2020-03-01')
+        data = store.read('AAA', '2020-01-01', '2020-06-01')
+    assert len(first) == (bars.index < '2020-03-01').sum()
+    assert data.index.equals(pd.DatetimeIndex(bars.index[bars.index < '2020-06-01'], name='Date'))
+    # The second read only asked for the bars after the first one's last bar
+    assert pd.Timestamp(int(server.requests[1][1]['period1']), unit='s') == first.index[-1]
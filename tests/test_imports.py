@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The data layer is used headless (batch_signals.py, the scan workers), so it
+# must not pull in the UI libraries
+def test_data_layer_does_not_load_ui_libraries():
+    code = ('import sys, series, scanner, intraday, backtest, rules, shared_store; '
+            'print(sorted({name.split(".")[0] for name in sys.modules} & {"plotly", "streamlit", "yfinance"}))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == '[]'
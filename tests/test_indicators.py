@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from conftest import make_ohlcv
+from indicators import generate_trading_signals, identify_support_resistance_levels, williams_r
+
+
+# williamR.py's original loop over every bar
+def reference_levels(df, period):
+    support_levels = []
+    resistance_levels = []
+    for i in range(period, len(df) - period):
+        low_period = df['Low'].iloc[i - period:i + period + 1].min()
+        high_period = df['High'].iloc[i - period:i + period + 1].max()
+        if df['Low'].iloc[i] == low_period:
+            support_levels.append(df['Low'].iloc[i])
+        if df['High'].iloc[i] == high_period:
+            resistance_levels.append(df['High'].iloc[i])
+
+    lowest_support = min(support_levels) if support_levels else None
+    highest_resistance = max(resistance_levels) if resistance_levels else None
+    most_support = max(set(support_levels), key=support_levels.count) if support_levels else None
+    most_resistance = max(set(resistance_levels), key=resistance_levels.count) if resistance_levels else None
+    return lowest_support, most_support, highest_resistance, most_resistance
+
+
+# williamR.py's original loop over every bar, returning (date, close) pairs
+def reference_signals(df, most_support, most_resistance):
+    buy_signals = []
+    sell_signals = []
+    for i in range(1, len(df)):
+        if df['Williams %R'].iloc[i - 1] < -80 and df['Williams %R'].iloc[i] > -80 and df['Low'].iloc[i] <= most_support:
+            buy_signals.append((df.index[i], df['Close'].iloc[i]))
+        if df['Williams %R'].iloc[i - 1] > -20 and df['Williams %R'].iloc[i] < -20 and df['High'].iloc[i] >= most_resistance:
+            sell_signals.append((df.index[i], df['Close'].iloc[i]))
+    return buy_signals, sell_signals
+
+
+# Prices on a coarse grid, so levels repeat and the most touched one matters
+def rounded_ohlcv(n_bars=600, seed=0):
+    data = make_ohlcv(n_bars, seed=seed)
+    return (data * 2).round() / 2
+
+
+def test_levels_match_the_loop():
+    for seed in range(3):
+        data = rounded_ohlcv(seed=seed)
+        for period in (3, 14):
+            assert identify_support_resistance_levels(data, period) == reference_levels(data, period)
+
+
+def test_levels_without_pivots():
+    data = make_ohlcv(10)
+    assert identify_support_resistance_levels(data, 14) == reference_levels(data, 14) == (None, None, None, None)
+
+
+def test_panel_levels_match_each_ticker():
+    frames = {f'T{seed}': rounded_ohlcv(400, seed) for seed in range(3)}
+    panel = pd.concat({field: pd.DataFrame({ticker: data[field] for ticker, data in frames.items()})
+                       for field in ('Open', 'High', 'Low', 'Close')}, axis=1)
+    levels = identify_support_resistance_levels(panel, 14)
+    assert levels == {ticker: reference_levels(data, 14) for ticker, data in frames.items()}
+    assert all(np.isfinite(level[1]) for level in levels.values())
+
+
+def test_signals_match_the_loop():
+    data = make_ohlcv(1000, seed=2)
+    data['Williams %R'] = williams_r(data)
+    _, most_support, _, most_resistance = reference_levels(data, 14)
+    # The app's levels, and levels most bars touch so that many signals fire
+    for support, resistance in ((most_support, most_resistance), (data['Low'].median(), data['High'].median())):
+        buy, sell = generate_trading_signals(data, support, resistance)
+        expected_buy, expected_sell = reference_signals(data, support, resistance)
+        assert list(buy) == [date for date, _ in expected_buy]
+        assert list(sell) == [date for date, _ in expected_sell]
+    assert len(buy) and len(sell)
+
+
+def test_panel_signals_match_each_ticker():
+    frames = {f'T{seed}': make_ohlcv(500, seed=seed) for seed in range(3)}
+    panel = pd.concat({field: pd.DataFrame({ticker: data[field] for ticker, data in frames.items()})
+                       for field in ('Open', 'High', 'Low', 'Close')}, axis=1)
+    panel = pd.concat([panel, pd.concat({'Williams %R': williams_r(panel)}, axis=1)], axis=1)
+    support = {ticker: data['Low'].median() for ticker, data in frames.items()}
+    resistance = {ticker: data['High'].median() for ticker, data in frames.items()}
+    buy, sell = generate_trading_signals(panel, support, resistance)
+    for ticker, data in frames.items():
+        data = data.assign(**{'Williams %R': williams_r(data)})
+        expected_buy, expected_sell = reference_signals(data, support[ticker], resistance[ticker])
+        assert list(buy[ticker]) == [date for date, _ in expected_buy]
+        assert list(sell[ticker]) == [date for date, _ in expected_sell]
@@ -0,0 +1,56 @@
+import numpy as np
+
+from conftest import make_ohlcv
+from indicators import identify_candle_patterns
+from patterns import pattern_bitmask
+
+
+# candlestick.py's original column-by-column implementation
+def reference_candle_patterns(df):
+    df = df.copy()
+    bullish = df['Close'] > df['Open']
+    bearish = df['Close'] < df['Open']
+    prev_bullish = df['Close'].shift(1) > df['Open'].shift(1)
+    prev_bearish = df['Close'].shift(1) < df['Open'].shift(1)
+    df['Bullish After Bearish'] = (bullish & prev_bearish & (df['Close'].shift(1) > df['Open'])
+                                   & (df['Open'].shift(1) < df['Close']))
+    df['Bearish Engulfing'] = (bearish & prev_bullish & (df['Close'].shift(1) < df['Open'])
+                               & (df['Open'].shift(1) > df['Close']))
+    return df
+
+
+def test_engulfing_matches_the_original_columns():
+    data = make_ohlcv(2000, seed=3)
+    result = identify_candle_patterns(data)
+    expected = reference_candle_patterns(data)
+    for column in ('Bullish After Bearish', 'Bearish Engulfing'):
+        assert expected[column].any()
+        assert (result[column].to_numpy() == expected[column].to_numpy()).all()
+    # The input frame is left alone
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+
+def test_blocks_match_one_pass():
+    panel = [make_ohlcv(500, seed=seed) for seed in range(4)]
+    arrays = [np.column_stack([data[field].to_numpy() for data in panel]) for field in ('Open', 'High', 'Low', 'Close')]
+    whole = pattern_bitmask(*arrays, chunk_rows=len(arrays[0]))
+    assert whole.any()
+    for chunk_rows in (1, 2, 3, 7, 64):
+        assert (pattern_bitmask(*arrays, chunk_rows=chunk_rows) == whole).all()
+    # A single ticker's column gives the same bits as in the panel
+    assert (pattern_bitmask(*(values[:, 1] for values in arrays), chunk_rows=5) == whole[:, 1]).all()
+
+
+def test_float32_input_matches_float64_of_the_same_values():
+    data = make_ohlcv(1000, seed=5).astype('float32')
+    arrays = [data[field].to_numpy() for field in ('Open', 'High', 'Low', 'Close')]
+    expected = pattern_bitmask(*(values.astype('float64') for values in arrays))
+    assert expected.any()
+    assert (pattern_bitmask(*arrays, chunk_rows=100) == expected).all()
+
+
+def test_missing_bars_never_match():
+    data = make_ohlcv(50, seed=1)
+    data.iloc[10] = np.nan
+    mask = pattern_bitmask(*(data[field].to_numpy() for field in ('Open', 'High', 'Low', 'Close')))
+    assert mask[10] == 0
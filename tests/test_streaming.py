@@ -0,0 +1,54 @@
+import numpy as np
+
+from conftest import make_ohlcv
+from indicators import calculate_ema, identify_candle_patterns, williams_r
+from streaming import StreamingCandlePatterns, StreamingEMA, StreamingWilliamsR
+
+
+# History with a few missing bars, which the pandas versions skip over
+def gappy_ohlcv():
+    data = make_ohlcv(600, seed=4)
+    data.iloc[[50, 51, 300, 599]] = np.nan
+    return data
+
+
+def updates(indicator, data):
+    return np.array([indicator.update(bar) for bar in data.to_dict('records')], dtype='float64')
+
+
+def test_ema_matches_pandas():
+    data = gappy_ohlcv()
+    for span in (2, 12, 26):
+        np.testing.assert_array_equal(updates(StreamingEMA(span), data), calculate_ema(data, span).to_numpy())
+
+
+def test_williams_r_matches_pandas():
+    data = gappy_ohlcv()
+    for period in (3, 14):
+        np.testing.assert_array_equal(updates(StreamingWilliamsR(period), data), williams_r(data, period).to_numpy())
+
+
+def test_candle_patterns_match_pandas():
+    data = make_ohlcv(600, seed=6)
+    detector = StreamingCandlePatterns()
+    flags = [detector.update(bar) for bar in data.to_dict('records')]
+    expected = identify_candle_patterns(data)
+    for column in ('Bullish After Bearish', 'Bearish Engulfing'):
+        assert [bar[column] for bar in flags] == expected[column].tolist()
+
+
+# Warming up on the first part of a history and updating with the rest gives
+# the values of the whole history at once
+def test_warm_up_then_update():
+    data = gappy_ohlcv()
+    head, tail = data.iloc[:400], data.iloc[400:]
+    for indicator, full in ((StreamingEMA(12), calculate_ema(data, 12)), (StreamingWilliamsR(14), williams_r(data, 14))):
+        warm = indicator.warm_up(head)
+        np.testing.assert_array_equal(warm.to_numpy(), full.to_numpy()[:400])
+        np.testing.assert_array_equal(updates(indicator, tail), full.to_numpy()[400:])
+
+    detector = StreamingCandlePatterns()
+    detector.warm_up(head)
+    expected = identify_candle_patterns(data).iloc[400:]
+    flags = [detector.update(bar) for bar in tail.to_dict('records')]
+    assert [bar['Bearish Engulfing'] for bar in flags] == expected['Bearish Engulfing'].tolist()
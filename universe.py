@@ -0,0 +1,68 @@
+# Function to get the top 50 stocks (example list)
+def get_top_stocks():
+    stocks = {
+        "Apple": "AAPL",
+        "Microsoft": "MSFT",
+        "Alphabet": "GOOGL",
+        "Amazon": "AMZN",
+        "Tesla": "TSLA",
+        "Meta": "META",
+        "Berkshire Hathaway": "BRK-B",
+        "Johnson & Johnson": "JNJ",
+        "Visa": "V",
+        "Walmart": "WMT",
+        "Procter & Gamble": "PG",
+        "UnitedHealth Group": "UNH",
+        "NVIDIA": "NVDA",
+        "Mastercard": "MA",
+        "Coca-Cola": "KO",
+        "Pfizer": "PFE",
+        "PepsiCo": "PEP",
+        "Intel": "INTC",
+        "Cisco": "CSCO",
+        "AbbVie": "ABBV",
+        "Verizon": "VZ",
+        "McDonald's": "MCD",
+        "Nike": "NKE",
+        "Salesforce": "CRM",
+        "Exxon Mobil": "XOM",
+        "Chevron": "CVX",
+        "AT&T": "T",
+        "Walt Disney": "DIS",
+        "3M": "MMM",
+        "IBM": "IBM",
+        "Goldman Sachs": "GS",
+        "American Express": "AXP",
+        "Costco": "COST",
+        "Honeywell": "HON",
+        "Lowe's": "LOW",
+        "Texas Instruments": "TXN",
+        "Broadcom": "AVGO",
+        "Qualcomm": "QCOM",
+        "Starbucks": "SBUX",
+        "Abbott Laboratories": "ABT",
+        "Booking Holdings": "BKNG",
+        "Danaher": "DHR",
+        "PayPal": "PYPL",
+        "Square": "SQ",
+        "Applied Materials": "AMAT",
+        "Lululemon": "LULU",
+        "Caterpillar": "CAT",
+        "Advanced Micro Devices": "AMD",
+        "S&P Global": "SPGI"
+    }
+    return stocks
+
+# List of top 50 stocks
+top_stocks = [
+    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA',
+    'FB', 'BRK.B', 'NVDA', 'JPM', 'JNJ',
+    'V', 'PG', 'UNH', 'HD', 'DIS',
+    'MA', 'PYPL', 'VZ', 'NFLX', 'INTC',
+    'CMCSA', 'T', 'PEP', 'KO', 'CSCO',
+    'NKE', 'MRK', 'XOM', 'TMO', 'PFE',
+    'ABT', 'AVGO', 'COST', 'CRM', 'MDT',
+    'NVS', 'AMGN', 'LLY', 'HON', 'QCOM',
+    'LMT', 'TXN', 'IBM', 'AMD', 'ADBE',
+    'CVX', 'PM', 'TGT', 'SBUX', 'NOW'
+]